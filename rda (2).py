@@ -1,74 +1,177 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from PIL import Image
-from urllib.request import urlopen
-from mplsoccer import PyPizza, add_image, FontManager
-from scipy.stats import rankdata
+import io
 import os
 
+from wtanalysis import (
+    ChartError, brand_image, cache_stats, guess_tags, league_logo, load_workbook, logo_status,
+    merge_workbooks,
+    stream_workbook,
+    percentile_cube, prefill_logos, render_chart, similar_players, workbook_cache,
+)
+from wtanalysis import timing
+from wtanalysis.batch import export_batch
+from wtanalysis.templates import POSITION_COLS
+from wtanalysis.timing import stage
+
 
 
 st.set_page_config(layout="wide")
 st.title("WT Analysis - Pizza Chart Generator")
 
-# File uploader
-uploaded_file = st.file_uploader(
-    "Upload Wyscout Data (All Metrics, Excel File)",
-    type=["xlsx"]
+# Every wtanalysis stage timed during this rerun lands in rerun_timings
+rerun_timings = timing.start()
+show_timings = st.sidebar.checkbox(
+    "🐞 Show timings", help="Per-stage timings of this rerun and cache hit rates.")
+
+
+def show_debug_panel():
+    if not show_timings:
+        return
+    with st.sidebar.expander("🐞 Timings", expanded=True):
+        summary = rerun_timings.summary()
+        st.caption(f"This rerun: {rerun_timings.elapsed() * 1000:.0f} ms, {len(summary)} stages "
+                   "(nested stages count in their parent too)")
+        st.dataframe(pd.DataFrame(
+            [(name, calls, round(total * 1000, 1)) for name, (calls, total) in summary.items()],
+            columns=["Stage", "Calls", "ms"],
+        ), hide_index=True)
+        st.dataframe(pd.DataFrame(
+            [(name, s["hits"], s["misses"], f"{s['hit_rate']:.0%}", s["entries"])
+             for name, s in cache_stats().items()],
+            columns=["Cache", "Hits", "Misses", "Hit rate", "Entries"],
+        ), hide_index=True)
+        st.download_button("Stages (JSON lines)", rerun_timings.jsonl(),
+                           file_name="timings.jsonl", mime="application/x-ndjson")
+        st.download_button("Metrics (Prometheus)", timing.prometheus_text(),
+                           file_name="metrics.prom", mime="text/plain")
+
+
+def stop():
+    show_debug_panel()
+    st.stop()
+
+
+# File uploader: one Wyscout export per league; several files are merged and tagged
+uploaded_files = st.file_uploader(
+    "Upload Wyscout Data (All Metrics, Excel Files - one per league)",
+    type=["xlsx", "csv"],
+    accept_multiple_files=True,
 )
 
 # 🚧 Stop the app until a file is provided
-if uploaded_file is None:
+if not uploaded_files:
     st.info("Upload an Excel (.xlsx) file to begin.")
     st.stop()
 
-# ✅ Safe to read after the guard above
-data_original = pd.read_excel(uploaded_file)
+# Very large exports: read in chunks, keeping only template columns and rows over a minute floor
+with st.sidebar.expander("🗜️ Large files"):
+    streaming = st.checkbox("Streaming import", help="Lower memory; CSV exports always stream")
+    import_minutes = st.number_input("Drop players under (minutes)", min_value=0, value=0,
+                                     step=90, disabled=not streaming)
 
-# ---- NEW: build Player -> allowed positions from position1..4 (via split) ----
-data2 = data_original.copy()
+# Players offered in the menu for the current search text
+PLAYER_MATCHES = 25
 
-# Split the Position column into position1..4 (same logic as later in your script)
-pos_split = data2['Position'].astype(str).str.split(',', expand=True)
-while pos_split.shape[1] < 4:
-    pos_split[pos_split.shape[1]] = None
-pos_split.columns = ['position1', 'position2', 'position3', 'position4']
-pos_split = pos_split.apply(lambda col: col.str.strip() if col.dtype == 'object' else col)
+LEAGUE_OPTIONS = ['', 'Bundesliga', 'Bundesliga Two', 'Championship', 'English 7th Tier',
+                  'La Liga', 'League One', 'League Two', 'Liga Portugal', 'Ligue 1', 'MLS',
+                  'National League', 'National League N/S', 'PGA League', 'Premier League',
+                  'Premier League 2', 'Pro League', 'Professional Development League',
+                  'Scottish Premiership', 'Serie A', 'U18 Premier League', 'USL Super League',
+                  'WSL', 'WSL2', "Women's A-League", "Women's National League"]
 
-# Normalise a few variants so menus match your downstream filters
-replacements = {
-    'LWF': 'LW', 'RWF': 'RW', 'LCMF': 'CM', 'RCMF': 'CM',
-    'DMF': 'DM', 'RDMF': 'DM', 'LDMF': 'DM', 'AMF': 'AM',
-    'RAMF': 'RW', 'LAMF': 'LW', 'RCB': 'CB', 'LCB': 'CB'
-}
-for c in ['position1', 'position2', 'position3', 'position4']:
-    pos_split[c] = pos_split[c].replace(replacements)
+# ✅ Safe to read after the guard above
+# Parsed once per file content and shared across reruns/sessions - don't modify in place
+if len(uploaded_files) == 1:
+    upload = uploaded_files[0]
+    is_csv = upload.name.lower().endswith(".csv")
+    with stage("app.load"):
+        if streaming or is_csv:
+            hits = workbook_cache.stats()["hits"]
+            dataset = stream_workbook(upload.getvalue(), min_minutes=import_minutes if streaming else 0,
+                                      csv=is_csv)
+            from_cache = workbook_cache.stats()["hits"] > hits
+        else:
+            dataset, from_cache = load_workbook(upload.getvalue())
+    workbook_stats = workbook_cache.stats()
+    st.caption(
+        f"{'Loaded from memory cache' if from_cache else 'Loaded'} "
+        f"({dataset.source}, {dataset.parse_seconds:.2f}s) | "
+        f"workbook cache: {workbook_stats['hits']} hits / {workbook_stats['misses']} misses"
+    )
+    store = None
+elif any(f.name.lower().endswith(".csv") for f in uploaded_files):
+    st.error("CSV exports can only be loaded one at a time; upload .xlsx files to merge leagues.")
+    stop()
+else:
+    # Each file is tagged with a league and season (guessed from its name, editable);
+    # adding a file only parses that file, the rest of the merge is reused
+    with st.sidebar.expander("📁 Uploaded files"):
+        tagged_files = []
+        for i, f in enumerate(uploaded_files):
+            guess_league, guess_season = guess_tags(f.name)
+            tag_league = st.text_input(f"League: {f.name}", value=guess_league, key=f"tag_league_{i}_{f.name}")
+            tag_season = st.text_input(f"Season: {f.name}", value=guess_season, key=f"tag_season_{i}_{f.name}")
+            tagged_files.append((f.getvalue(), tag_league, tag_season))
+    with stage("app.load"):
+        store, parsed = merge_workbooks(tagged_files)
+    st.caption(
+        f"{len(uploaded_files)} files merged: {len(store)} rows, {len(store.leagues)} leagues | "
+        f"{parsed} workbook(s) loaded this run"
+    )
 
-data2 = pd.concat([data2.drop(columns=['Position']), pos_split], axis=1)
+# Decode any locally available league logos into memory (no-op once cached)
+prefill_logos()
 
-# Map each player to the set of positions they actually played (from position1..4)
-def positions_for_player(df, player_name):
-    rows = df.loc[df['Player'] == player_name, ['position1', 'position2', 'position3', 'position4']]
-    vals = pd.unique(rows.values.ravel('K'))
-    allowed = [p for p in vals if isinstance(p, str) and p.strip() != ""]
-    # Optional: keep a consistent order you like; otherwise just sort
-    order = ['GK','CB','LB','RB','LWB','RWB','DM','CM','AM','LW','RW','CF']
-    allowed = sorted(set(allowed), key=lambda x: order.index(x) if x in order else len(order))
-    return allowed
+# A mid-season transfer lists a player once per club. Merged, each player is one season line
+# (totals summed, rates weighted by minutes) - one groupby per dataset, kept with it
+combine_splits = st.sidebar.checkbox(
+    "Combine transfer splits", value=True,
+    help="Count a player who changed clubs mid-season once, in cohorts and charts.",
+)
+if combine_splits:
+    split_rows = len(store if store is not None else dataset)
+    if store is not None:
+        store = store.combined
+    else:
+        dataset = dataset.combined
+    merged_rows = split_rows - len(store if store is not None else dataset)
+    if merged_rows:
+        st.caption(f"{merged_rows} transfer split row(s) merged into season lines")
 
 # ---- UI: player first, then a position menu constrained to that player ----
-league = st.selectbox(
-    "League",
-    options=['', 'Bundesliga', 'Bundesliga Two', 'Championship', 'English 7th Tier',
-             'La Liga', 'League One', 'League Two', 'Liga Portugal', 'Ligue 1', 'MLS',
-             'National League', 'National League N/S', 'PGA League', 'Premier League',
-             'Premier League 2', 'Pro League', 'Professional Development League',
-             'Scottish Premiership', 'Serie A', 'U18 Premier League', 'USL Super League',
-             'WSL', 'WSL2', "Women's A-League", "Women's National League"]
-)
-unique_players = sorted(data2['Player'].dropna().unique())
-playerrequest = st.selectbox("Select Player", options=unique_players, key="player_select")
+if store is None:
+    league = st.selectbox("League", options=LEAGUE_OPTIONS)
+else:
+    # Picking a league filters the merged store; blank ranks across every uploaded league
+    league = st.selectbox("League", options=[''] + store.leagues)
+    dataset = store.select(league)
+
+data_original = dataset.frame
+# Templates are checked against the workbook's columns once, when it's loaded
+if dataset.missing_template_columns:
+    st.warning(
+        "Some position templates can't be charted from this file (missing columns): "
+        + "; ".join(f"{pos}: {', '.join(cols)}" for pos, cols in dataset.missing_template_columns.items())
+    )
+# Type-ahead search: the menu only ever holds the best matches, not every player in the file
+search_index = dataset.search_index
+player_query = st.text_input("Search player", key="player_query",
+                             placeholder="Name, team or age - accents and typos are fine")
+matches = search_index.search(player_query, limit=PLAYER_MATCHES)
+# Options are player keys, so two players sharing a name are two entries (told apart by team/age)
+player_labels = {search_index.keys[i]: search_index.label(i) for i in matches}
+player_options = list(player_labels)
+# Keep the current pick selectable while the search text changes
+current_entry = search_index.find(st.session_state.get("player_select"))
+if current_entry is not None and search_index.keys[current_entry] not in player_labels:
+    player_options.insert(0, search_index.keys[current_entry])
+    player_labels[player_options[0]] = search_index.label(current_entry)
+if player_query and not len(matches):
+    st.caption(f"No players match '{player_query}'.")
+playerrequest = st.selectbox("Select Player", options=player_options, key="player_select",
+                             format_func=lambda p: player_labels.get(p, p))
+player_name = dataset.player_name(playerrequest)
 
 # Reset position when the player changes, so we never keep an invalid selection
 if "last_player" not in st.session_state:
@@ -77,7 +180,8 @@ if st.session_state.last_player != playerrequest:
     st.session_state.last_player = playerrequest
     st.session_state.position_select = ""  # clear prior selection
 
-allowed_positions = positions_for_player(data2, playerrequest)
+# Positions this player actually played (from position1..4), prebuilt once per dataset
+allowed_positions = dataset.positions_for_player(playerrequest)
 position_options = [""] + allowed_positions  # keep a blank for "please choose"
 position = st.selectbox(
     "Position",
@@ -88,13 +192,58 @@ position = st.selectbox(
 
 
 
-season = st.text_input("Season", value='Enter Season Name')
+# A merged league's files carry their season; otherwise it's typed in
+tagged_seasons = dataset.seasons() if store is not None else []
+season = st.text_input("Season", value=tagged_seasons[0] if len(tagged_seasons) == 1 and tagged_seasons[0]
+                       else 'Enter Season Name')
 minutethreshold = st.number_input("Minimum Minutes Played", value=0)
 
+# Optional: rank every position at a ladder of minute thresholds in the background
+precompute = st.sidebar.checkbox(
+    "Precompute percentiles",
+    help="Rank every position template at the thresholds below once per dataset, "
+         "so switching position or threshold doesn't re-rank.",
+)
+ladder_text = st.sidebar.text_input("Precompute minute thresholds", value="0, 450, 900, 1350")
+
 
-if uploaded_file:
-    file_path = uploaded_file
-    data = pd.read_excel(uploaded_file)
+
+cube = None
+if precompute:
+    try:
+        ladder = [int(x) for x in ladder_text.split(",") if x.strip()]
+    except ValueError:
+        st.sidebar.warning("Thresholds must be whole numbers separated by commas.")
+        ladder = []
+    if ladder:
+        templates = {pos: cols for pos, cols in POSITION_COLS.items()
+                     if pos not in dataset.missing_template_columns}
+        cube = percentile_cube(dataset, templates, ladder)
+        if not cube.done.is_set():
+            st.sidebar.caption("Precomputing percentiles in the background...")
+
+# ---- Batch export: every chart for every player in the selected cohort ----
+with st.sidebar.expander("📦 Batch export"):
+    st.caption("Render charts for every player at the selected position and minute threshold.")
+    batch_charts = st.multiselect("Charts", ["pizza", "radar", "raw_pizza"],
+                                  default=["pizza", "radar", "raw_pizza"])
+    batch_formats = st.multiselect("Formats", ["png", "pdf"], default=["png"])
+    if st.button("Build zip", disabled=not (position and batch_charts and batch_formats)):
+        batch_zip = io.BytesIO()
+        try:
+            with st.spinner("Rendering charts..."):
+                n_files = export_batch(dataset, position, minutethreshold, league, season, batch_zip,
+                                       charts=batch_charts, formats=batch_formats)
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.download_button(
+                f"Download {n_files} files", batch_zip.getvalue(),
+                file_name=f"{position}_{minutethreshold}_mins.zip", mime="application/zip",
+            )
+
+if uploaded_files:
+    data = data_original
     
     ### USER INPUT
     
@@ -104,1000 +253,161 @@ if uploaded_file:
     #season = '2024/25'
     #minutethreshold = 900
     
-    ### FONT
-    font_normal = FontManager('https://raw.githubusercontent.com/googlefonts/roboto/main/'
-                              'src/hinted/Roboto-Regular.ttf')
-    font_italic = FontManager('https://raw.githubusercontent.com/googlefonts/roboto/main/'
-                              'src/hinted/Roboto-Italic.ttf')
-    font_bold = FontManager('https://raw.githubusercontent.com/google/fonts/main/apache/robotoslab/'
-                            'RobotoSlab[wght].ttf')
     ### IMAGES
-    
-    rdaimage = Image.open("wtatransnew.png")
-    # Define a dictionary mapping leagues to their image URLs
-    league_image_map = {
-        "Premier League": "https://cdn5.wyscout.com/photos/competition/public/5_140x140.png",
-        "League One": "https://cdn5.wyscout.com/photos/competition/public/64_140x140.png",
-        "Championship": "https://cdn5.wyscout.com/photos/competition/public/18_140x140.png",
-        "Serie A": "https://cdn5.wyscout.com/photos/competition/public/1_140x140.png",
-        "League Two": "https://cdn5.wyscout.com/photos/competition/public/67_140x140.png",
-        "Scottish Premiership": "https://cdn5.wyscout.com/photos/competition/public/17_140x140.png",
-        "MLS": "https://cdn5.wyscout.com/photos/competition/public/324_140x140.png",
-        "WSL": "https://cdn5.wyscout.com/photos/competition/public/g886_140x140.png",
-        "WSL2": "https://cdn5.wyscout.com/photos/competition/public/g1330_140x140.png",
-        "Women's National League": "https://cdn5.wyscout.com/photos/competition/public/g327_140x140.png",
-        "PGA League": "https://cdn5.wyscout.com/photos/competition/public/g-557_140x140.png",
-        "Women's A-League": "https://cdn5.wyscout.com/photos/competition/public/g370_140x140.png",
-        "USL Super League": "https://cdn5.wyscout.com/photos/competition/public/g-985_140x140.png",
-        "La Liga": "https://cdn5.wyscout.com/photos/competition/public/4_140x140.png",
-        "Bundesliga": "https://cdn5.wyscout.com/photos/competition/public/2_140x140.png",
-        "Bundesliga Two": "https://cdn5.wyscout.com/photos/competition/public/19_140x140.png",
-        "Ligue 1": "https://cdn5.wyscout.com/photos/competition/public/3_140x140.png",
-        "Pro League": "https://cdn5.wyscout.com/photos/competition/public/28_140x140.png",
-        "Liga Portugal": "https://cdn5.wyscout.com/photos/competition/public/9_140x140.png",
-        "National League": "https://cdn5.wyscout.com/photos/competition/public/135_140x140.png",
-        "National League N/S": "https://cdn5.wyscout.com/photos/competition/public/135_140x140.png",
-        "English 7th Tier": "https://cdn5.wyscout.com/photos/competition/public/555_140x140.png",
-        "U18 Premier League": "https://cdn5.wyscout.com/photos/competition/public/g950_140x140.png",
-        "Premier League 2": "https://cdn5.wyscout.com/photos/competition/public/g1592_140x140.png",
-        "Professional Development League": "https://cdn5.wyscout.com/photos/competition/public/g1191_140x140.png",
-        "INT-FIFACWC": "https://cdn5.wyscout.com/photos/competition/public/g72_140x140.png"
-    }
+    # Decoded once and kept in memory; logos come from local files first and a
+    # slow CDN fetch leaves the logo off rather than blocking the chart
+    rdaimage = brand_image()
     
     # Safely get league logo only if league is selected
     if league:
-        leagueimage2 = league_image_map.get(league)
-        if leagueimage2 and leagueimage2.startswith("http"):
-            leagueimage = Image.open(urlopen(leagueimage2))
-        else:
-            st.warning("No logo available for selected league.")
-            leagueimage = None
+        leagueimage = league_logo(league)
+        if leagueimage is None:
+            # a download still in flight is not missing: the logo shows on a later rerun
+            if logo_status(league) == "pending":
+                st.caption("League logo is still downloading; charts show it once it arrives.")
+            else:
+                st.warning("No logo available for selected league.")
     else:
         leagueimage = None
-    cols_to_move = ['Birth country', 'Passport country', 'Foot', 'Height', 'Weight', 'On loan']
-    all_cols = list(data.columns)
-    before = all_cols[:7]
-    moving = [col for col in cols_to_move if col in all_cols]
-    after = [col for col in all_cols if col not in before + moving]
-    new_order = before + moving + after
-    data = data[new_order]
-    
-    ## POSITION SPLIT
-    position_split = data['Position'].str.split(',', expand=True)
-    while position_split.shape[1] < 4:
-        position_split[position_split.shape[1]] = None
-    position_split.columns = ['position1', 'position2', 'position3', 'position4']
-    position_split = position_split.apply(lambda col: col.str.strip() if col.dtype == 'object' else col)
-    data = pd.concat([data.drop(columns=['Position']), position_split], axis=1)
-    position_cols = ['position1', 'position2', 'position3', 'position4']
-    position_cols = [col for col in position_cols if col in data.columns]
-    all_cols = list(data.columns)
-    before = all_cols[:5]
-    middle = position_cols
-    after = [col for col in all_cols if col not in before + middle]
-    new_order = before + middle + after
-    data = data[new_order]
-    replacements = {'LWF': 'LW', 'RWF': 'RW', 'LCMF':'CM','RCMF':'CM','DMF':'DM','RDMF':'DM','LDMF':'DM','AMF':'AM','RAMF':'RW',
-                   'LAMF':'LW','RCB':'CB','LCB':'CB'}
-    for col in ['position1', 'position2', 'position3', 'position4']:
-        if col in data.columns:
-            data[col] = data[col].replace(replacements)
-    position_data = data[
-        (data['position1'] == position) |
-        (data['position2'] == position) |
-        (data['position3'] == position) |
-        (data['position4'] == position)
-    ]
-    position_data = position_data.loc[position_data['Minutes played']>= minutethreshold]
-    # DEBUG: Show filtered dataset
-    st.subheader("Filtered Data Preview")
-    st.dataframe(position_data)
+    # Only the cohort's rows are sliced out of the shared frame; the column
+    # reordering below then works on that slice, not on a copy of the whole export.
+    # Rows are still in file order, so the precomputed position index applies.
+    with stage("app.preview"):
+        cohort_rows = dataset.cohort_rows(position, minutethreshold)
+        data = data.iloc[cohort_rows]
+
+        cols_to_move = ['Birth country', 'Passport country', 'Foot', 'Height', 'Weight', 'On loan']
+        all_cols = list(data.columns)
+        before = all_cols[:7]
+        moving = [col for col in cols_to_move if col in all_cols]
+        after = [col for col in all_cols if col not in before + moving]
+        new_order = before + moving + after
+
+        ## POSITION SPLIT (position1..4 are normalised once at load)
+        new_order.remove('Position')
+        position_cols = ['position1', 'position2', 'position3', 'position4']
+        new_order = new_order[:5] + position_cols + new_order[5:]
+        data = pd.concat([data, dataset.positions.iloc[cohort_rows]], axis=1)
+        position_data = data[new_order]
+        # DEBUG: Show filtered dataset
+        st.subheader("Filtered Data Preview")
+        st.dataframe(position_data)
 
     if position_data.empty:
         st.warning("No players found for that position or below the minute threshold.")
-        st.stop()
+        stop()
 
-    if playerrequest not in position_data['Player'].values:
-        st.warning(f"Player '{playerrequest}' not found in the filtered dataset.")
-        st.stop()
+    # Rows are looked up by player key (two hash lookups), not by scanning names
+    if not len(dataset.player_rows(playerrequest, cohort_rows)):
+        st.warning(f"Player '{player_name}' not found in the filtered dataset.")
+        stop()
 
-    tab_pizza, tab_radar, tab_raw_pizza = st.tabs(["📊 Pizza", "🧭 Radar", "📈 Raw Pizza"])
-    with tab_pizza:
-        # ⬇️ YOUR EXISTING PIZZA CODE GOES INSIDE THIS BLOCK ⬇️
-        # (No changes required to your current pizza logic)
+    # Lazy tabs: with on_change="rerun" only the selected tab's body does any work.
+    # Older Streamlit versions can't track the selected tab, so every tab renders there.
+    chart_tab_labels = ["📊 Pizza", "🧭 Radar", "📈 Raw Pizza", "🔎 Similar players"]
+    try:
+        tab_pizza, tab_radar, tab_raw_pizza, tab_similar = st.tabs(
+            chart_tab_labels, key="chart_tab", on_change="rerun")
+    except TypeError:
+        tab_pizza, tab_radar, tab_raw_pizza, tab_similar = st.tabs(chart_tab_labels)
 
+    def tab_is_open(tab):
+        return getattr(tab, "open", None) is not False
 
-        cols_to_percentile = position_data.columns[18:]
-        for col in cols_to_percentile:
-            if pd.api.types.is_numeric_dtype(position_data[col]):
-                position_data[col] = rankdata(position_data[col], method='average') / len(position_data[col]) * 100
-        position_data.head()
-        if position == 'CM':
-            cols = [
-                "Non-penalty goals per 90", "xG per 90", "xA per 90",
-                "Shot assists per 90", "Touches in box per 90",
-                "Accurate passes, %", "Accurate progressive passes, %", "Progressive runs per 90",
-                "Accurate passes to final third, %", "Accurate crosses, %",
-                "Successful defensive actions per 90", "Defensive duels won, %",
-                "PAdj Sliding tackles", "Shots blocked per 90", "PAdj Interceptions"
-            ]
-        elif position == 'LB':
-            cols = [
-                "Shot assists per 90", "xA per 90", "Assists per 90",
-                "xG per 90", "Successful attacking actions per 90",
-                "Accurate passes, %", "Accurate progressive passes, %", "Crosses per 90", 
-                "Accurate crosses, %", "Progressive runs per 90",
-                "Successful defensive actions per 90", "Defensive duels won, %",
-                "PAdj Sliding tackles", "Shots blocked per 90", "PAdj Interceptions"
-            ]
-        elif position == 'RB':
-            cols = [
-                "Shot assists per 90", "xA per 90", "Assists per 90",
-                "xG per 90", "Successful attacking actions per 90",
-                "Accurate passes, %", "Accurate progressive passes, %", "Crosses per 90", 
-                "Accurate crosses, %", "Progressive runs per 90",
-                "Successful defensive actions per 90", "Defensive duels won, %",
-                "PAdj Sliding tackles", "Shots blocked per 90", "PAdj Interceptions"
-            ]
-        elif position == 'RWB':
-            cols = [
-                "Shot assists per 90", "xA per 90", "Assists per 90",
-                "xG per 90", "Successful attacking actions per 90",
-                "Accurate passes, %", "Accurate progressive passes, %", "Crosses per 90", 
-                "Accurate crosses, %", "Progressive runs per 90",
-                "Successful defensive actions per 90", "Defensive duels won, %",
-                "PAdj Sliding tackles", "Shots blocked per 90", "PAdj Interceptions"
-            ]
-        elif position == 'LWB':
-            cols = [
-                "Shot assists per 90", "xA per 90", "Assists per 90",
-                "xG per 90", "Successful attacking actions per 90",
-                "Accurate passes, %", "Accurate progressive passes, %", "Crosses per 90", 
-                "Accurate crosses, %", "Progressive runs per 90",
-                "Successful defensive actions per 90", "Defensive duels won, %",
-                "PAdj Sliding tackles", "Shots blocked per 90", "PAdj Interceptions"
-            ]
-        elif position == 'CB':
-            cols = [
-                "Offensive duels won, %", "Shot assists per 90", "xA per 90",
-                "xG per 90", "Non-penalty goals per 90",
-                "Accurate passes, %", "Accurate lateral passes, %", "Accurate short / medium passes, %", 
-                "Progressive passes per 90", "Accurate progressive passes, %",
-                "Defensive duels won, %", "Successful defensive actions per 90",
-                "Aerial duels won, %", "PAdj Interceptions", "Shots blocked per 90"
-            ]
-        
-        elif position == 'CF':
-            cols = [
-                "Touches in box per 90", "Shots per 90", "Shots on target, %",
-                "xG per 90", "Non-penalty goals per 90",
-                "Accurate passes, %", "Accurate smart passes, %", "Shot assists per 90", 
-                "xA per 90", "Assists per 90",
-                "Offensive duels per 90", "Offensive duels won, %",
-                "Aerial duels won, %", "Successful dribbles, %", "Successful attacking actions per 90"
-            ]   
-        elif position == 'LW':
-            cols = [
-                "Touches in box per 90", "Shots per 90", "Shots on target, %",
-                "xG per 90", "Non-penalty goals per 90",
-                "Progressive runs per 90", "Accurate crosses, %", "Shot assists per 90", 
-                "xA per 90", "Assists per 90",
-                "Offensive duels per 90", "Offensive duels won, %",
-                "Dribbles per 90", "Successful dribbles, %", "Successful attacking actions per 90"
-            ]
-        elif position == 'RW':
-            cols = [
-                "Touches in box per 90", "Shots per 90", "Shots on target, %",
-                "xG per 90", "Non-penalty goals per 90",
-                "Progressive runs per 90", "Accurate crosses, %", "Shot assists per 90", 
-                "xA per 90", "Assists per 90",
-                "Offensive duels per 90", "Offensive duels won, %",
-                "Dribbles per 90", "Successful dribbles, %", "Successful attacking actions per 90"
-            ] 
-        elif position == 'DM':
-            cols = [
-                "Successful attacking actions per 90", "Shot assists per 90", "xA per 90",
-                "Shots per 90", "xG per 90",
-                "Accurate passes, %", "Accurate short / medium passes, %", "Accurate through passes, %", 
-                "Progressive passes per 90", "Accurate progressive passes, %",
-                "Successful defensive actions per 90", "Defensive duels per 90",
-                "Defensive duels won, %", "PAdj Sliding tackles", "PAdj Interceptions"
-            ]
-        elif position == 'AM':
-            cols = [
-                "Touches in box per 90", "Shots per 90", "Goal conversion, %",
-                "Non-penalty goals per 90", "xG per 90",
-                "Accurate passes to penalty area, %", "Accurate crosses, %", "Shot assists per 90", 
-                "xA per 90", "Assists per 90",
-                "Offensive duels per 90", "Offensive duels won, %", "Successful attacking actions per 90",
-                "Dribbles per 90", "Successful dribbles, %"
-            ]
+    # Each tab is a thin call into wtanalysis.api; charts come back as PNG bytes from
+    # a cache keyed by the chart inputs, so re-selecting a recent player is instant.
+    # ChartError carries the message for the user.
+    def show_chart(chart, **kwargs):
+        try:
+            png, _ = render_chart(
+                dataset, chart, playerrequest, position, league, season, minutethreshold,
+                brand=rdaimage, logo=leagueimage, **kwargs,
+            )
+        except ChartError as exc:
+            st.warning(str(exc))
         else:
-            cols = []  # Handle other cases if needed
-        playerdata = position_data.loc[position_data['Player']==playerrequest]
-        selected_columns = ['Player', 'Team', 'Age'] + cols
-        new_df = playerdata[selected_columns].copy()
-        new_df[cols] = new_df[cols].round(0)
-        new_df[cols] = new_df[cols].astype(int)
-        
-        
-        if position == 'CM':
-            params = [
-            "Non-penalty goals", "xG", "xA",
-            "Shot assists", "Touches in box",
-            "Accurate passes %", "\nAccurate progressive \npasses %", "Progressive runs",
-            "\nAccurate passes \nto final third %", "Accurate crosses %",
-            "\nSuccessful \ndefensive actions", "\nDefensive \nduels won %",
-            "\nPAdj Sliding n\tackles", "Shots blocked", "\nPAdj \nInterceptions"
-        ]
-        elif position == 'LB':
-            params = [
-                "Shot assists", "xA", "Assists",
-                "xG", "\nSuccessful \nattacking actions",
-                "Accurate passes %", "\nAccurate progressive \npasses %", "Crosses", 
-                "Accurate crosses %", "Progressive runs",
-                "\nSuccessful \ndefensive actions per 90", "\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles", "Shots blocked", "\nPAdj \nInterceptions"
-            ]
-        elif position == 'RB':
-            params = [
-                "Shot assists", "xA", "Assists",
-                "xG", "\nSuccessful \nattacking actions",
-                "Accurate passes %", "\nAccurate progressive \npasses %", "Crosses", 
-                "Accurate crosses %", "Progressive runs",
-                "\nSuccessful \ndefensive actions per 90", "\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles", "Shots blocked", "\nPAdj \nInterceptions"
-            ]
-        elif position == ':WB':
-            params = [
-                "Shot assists", "xA", "Assists",
-                "xG", "\nSuccessful \nattacking actions",
-                "Accurate passes %", "\nAccurate progressive \npasses %", "Crosses", 
-                "Accurate crosses %", "Progressive runs",
-                "\nSuccessful \ndefensive actions per 90", "\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles", "Shots blocked", "\nPAdj \nInterceptions"
-            ]
-        elif position == 'RWB':
-            params = [
-                "Shot assists", "xA", "Assists",
-                "xG", "\nSuccessful \nattacking actions",
-                "Accurate passes %", "\nAccurate progressive \npasses %", "Crosses", 
-                "Accurate crosses %", "Progressive runs",
-                "\nSuccessful \ndefensive actions per 90", "\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles", "Shots blocked", "\nPAdj \nInterceptions"
-            ]
-        elif position == 'CB':
-            params = [    
-                "\nOffensive \nduels won %", "Shot assists", "xA",
-                "xG", "\nNon-penalty \ngoals",
-                "Accurate passes %", "\nAccurate lateral \npasses %", "\nAccurate short \n& medium passes %", 
-                "\nProgressive \npasses", "\nAccurate progressive \npasses %",
-                "\nDefensive \nduels won %", "\nSuccessful \ndefensive actions",
-                "\nAerial \nduels won %", "\nPAdj \nInterceptions", "Shots blocked"
-            ]
-            
-        elif position == 'CF':
-            params = [
-                "Touches in box", "Shots", "\nShots on \ntarget %",
-                "xG", "Non-penalty goals",
-                "Accurate passes %", "\nAccurate smart \npasses %", "Shot assists", 
-                "xA", "Assists",
-                "Offensive duels", "\nOffensive \nduels won %",
-                "\nAerial \nduels won %", "\nSuccessful \ndribbles %", "\nSuccessful \nattacking actions"
-            ]  
-        elif position == 'LW':
-            params = [
-                "Touches in box", "Shots", "\nShots on \ntarget %",
-                "xG", "Non-penalty goals",
-                "Progressive runs", "Accurate crosses %", "Shot assists", 
-                "xA", "Assists",
-                "Offensive duels", "\nOffensive \nduels won %",
-                "Dribbles", "\nSuccessful \ndribbles %", "\nSuccessful \nattacking actions"
-            ]  
-        elif position == 'RW':
-            params = [
-                "Touches in box", "Shots", "\nShots on \ntarget %",
-                "xG", "Non-penalty goals",
-                "Progressive runs", "Accurate crosses %", "Shot assists", 
-                "xA", "Assists",
-                "Offensive duels", "\nOffensive \nduels won %",
-                "Dribbles", "\nSuccessful \ndribbles %", "\nSuccessful \nattacking actions"
-            ]  
-        elif position == 'DM':
-            params = [
-                "\nSuccessful \nattacking actions", "Shot assists", "xA",
-                "Shots", "xG",
-                "Accurate passes %", "\nAccurate \nshort/medium passes %", "\nAccurate \nthrough passes %", 
-                "\nProgressive \npasses", "\nAccurate \nprogressive passes %",
-                "\nSuccessful \ndefensive actions", "Defensive duels",
-                "\nDefensive \nduels won %", "\nPAdj \nSliding tackles", "\nPAdj \nInterceptions"
-            ]
-        
-        elif position == 'AM':
-            params = [
-                "Touches in box", "Shots", "Goal conversion %",
-                "Non-penalty goals", "xG",
-                "\nAccurate passes \nto penalty area %", "\nAccurate \ncrosses %", "Shot assists", 
-                "xA", "Assists",
-                "Offensive duels", "\nOffensive \nduels won %", "\nSuccessful \nattacking actions",
-                "Dribbles", "\nSuccessful \ndribbles %"
-            ] 
-            #params = []  # Handle other cases if needed
-        
-        # parameter list
-        
-        
-        
-        # Assuming `new_df` is your DataFrame containing the values
-        # Extracting values from the DataFrame based on the columns specified in `params`
-        teamname = new_df['Team'].iloc[0]
-        
-        values = new_df[cols].values[0]
-        # color for the slices and text
-        slice_colors = ["#ea5a00"] * 5 + ["#004E89"] * 5 + ["#630101"] * 5
-        text_colors = ["#000000"] * 10 + ["#F2F2F2"] * 5
-        
-        # instantiate PyPizza class
-        baker = PyPizza(
-            params=params,                  # list of parameters
-            background_color="#F2F2F2",     # background color
-            straight_line_color="#F2F2F2",  # color for straight lines
-            straight_line_lw=1,             # linewidth for straight lines
-            last_circle_lw=0,               # linewidth of last circle
-            other_circle_lw=0,              # linewidth for other circles
-            inner_circle_size=20            # size of inner circle
-        )
-        
-        # plot pizza
-        fig, ax = baker.make_pizza(
-            values,                          # list of values
-            figsize=(8, 8.5),                # adjust figsize according to your need
-            color_blank_space="same",        # use same color to fill blank space
-            slice_colors=slice_colors,       # color for individual slices
-            value_colors=text_colors,        # color for the value-text
-            value_bck_colors=slice_colors,   # color for the blank spaces
-            blank_alpha=0.4,                 # alpha for blank-space colors
-            kwargs_slices=dict(
-                edgecolor="#F2F2F2", zorder=2, linewidth=1
-            ),                               # values to be used when plotting slices
-            kwargs_params=dict(
-                color="#000000", fontsize=11,
-                fontproperties=font_normal.prop, va="center"
-            ),                               # values to be used when adding parameter
-            kwargs_values=dict(
-                color="#000000", fontsize=11,
-                fontproperties=font_normal.prop, zorder=3,
-                bbox=dict(
-                    edgecolor="#000000", facecolor="cornflowerblue",
-                    boxstyle="round,pad=0.2", lw=1
+            st.image(png)
+
+    if tab_is_open(tab_pizza):
+        with tab_pizza, stage("tab.pizza"):
+            # Percentiles for just this template's metrics, memoised per (dataset, position, minutes)
+            percentiles = None
+            if cube is not None and position in cube.templates:
+                percentiles = cube.percentiles(position, minutethreshold, POSITION_COLS[position])
+            # With several leagues loaded, rank against a pooled population instead of
+            # the player's own league (a binary search into sorted per-metric arrays)
+            reference = None
+            if store is not None:
+                reference_leagues = st.multiselect(
+                    "Rank against leagues", options=store.leagues,
+                    help="Leave empty to rank within the selected league.",
                 )
-            )                                # values to be used when adding parameter-values
-        )
-        
-        # add title
-        fig.text(
-            0.515, 0.975, f'{playerrequest} - {teamname} - Percentile Rank (0-100)', size=16,
-            ha="center", fontproperties=font_bold.prop, color="#000000"
-        )
-        
-        # add subtitle
-        fig.text(
-            0.515, 0.953,
-            f'Compared against other {position} in {league} | Season {season}',
-            size=13,
-            ha="center", fontproperties=font_bold.prop, color="#000000"
-        )
-        
-        # add credits
-        CREDIT_1 = f"Data from Wyscout | Metrics are per 90 unless stated | Minimum {minutethreshold} mins played"
-        #CREDIT_2 = "inspired by: @Worville, @FootballSlices, @somazerofc & @Soumyaj15209314"
-        
-        fig.text(
-            0.99, 0.02, f"{CREDIT_1}", size=9,
-            fontproperties=font_italic.prop, color="#000000",
-            ha="right"
-        )
-        
-        # add text
-        #fig.text(
-        #    0.34, 0.925, " Scoring           Creativity         Duels", size=14,
-        #    fontproperties=font_bold.prop, color="#000000"
-        #)
-        
-        fig.text(
-            0.34, 0.925, "Attacking        Possession       Defending", size=14,
-            fontproperties=font_bold.prop, color="#000000"
-        )
-        
-        # add rectangles
-        fig.patches.extend([
-            plt.Rectangle(
-                (0.31, 0.9225), 0.025, 0.021, fill=True, color="#ea5a00",
-                transform=fig.transFigure, figure=fig
-            ),
-            plt.Rectangle(
-                (0.462, 0.9225), 0.025, 0.021, fill=True, color="#004E89",
-                transform=fig.transFigure, figure=fig
-            ),
-            plt.Rectangle(
-                (0.632, 0.9225), 0.025, 0.021, fill=True, color="#630101",
-                transform=fig.transFigure, figure=fig
-            ),
-        ])
-        # add image
-        #ax_image = add_image(
-        #    fdj_cropped, fig, left=0.4618, bottom=0.4475, width=0.095, height=0.1075
-        #)   # these values might differ when you are plotting
-        
-        
-        ax_image = add_image(
-            rdaimage, fig, left=0.87, bottom=0.85, width=0.15 ,height=0.15
-        )   # these values might differ when you are plotting
-        ax_image = add_image(
-            leagueimage, fig, left=0.05, bottom=0.01, width=0.125 ,height=0.125
-        )   # these values might differ when you are plotting
-        
-        
-        st.pyplot(fig)
-    pass
-    with tab_radar:
-        import numpy as np
-        import pandas as pd
-        import matplotlib.pyplot as plt
-        from mplsoccer import Radar, FontManager, add_image
-        import streamlit as st
-    
-        # ---------- 1) Start from a pristine copy so 'Position' exists ----------
-        if "data_original" not in globals():
-            st.error("Internal setup error: `data_original` not found. Make sure you set `data_original = pd.read_excel(uploaded_file)` right after upload.")
-            st.stop()
-    
-        df = data_original.copy()
-    
-        # ---------- 2) Normalise positions & filter by selected position ----------
-        df = data_original.copy() if "data_original" in globals() else data.copy()
-        
-        # robust position name cleanup
-        replacements = {
-            'LWF': 'LW', 'RWF': 'RW',
-            'LCMF': 'CM', 'RCMF': 'CM',
-            'DMF': 'DM', 'RDMF': 'DM', 'LDMF': 'DM',
-            'AMF': 'AM', 'RAMF': 'RW', 'LAMF': 'LW',
-            'RCB': 'CB', 'LCB': 'CB',
-            'LWB': 'LB', 'RWB': 'RB',
-        }
-        
-        if "Position" not in df.columns:
-            st.error("Your data has no 'Position' column. The radar cannot be filtered.")
-            st.stop()
-        
-        # perform replacements safely even when multiple positions are listed
-        pos = df["Position"].astype(str)
-        for src, dst in replacements.items():
-            pos = pos.str.replace(fr'\b{src}\b', dst, regex=True)
-        df["Position"] = pos
-        
-        if not position:
-            st.warning("Pick a position to build the radar.")
-            st.stop()
-        
-        # match tokens, not substrings, so 'RW' doesn't grab 'CRW'
-        df = df[df["Position"].str.contains(fr'\b{position}\b', case=False, na=False)]
-        
-        if df.empty:
-            st.error(f"No rows for position '{position}' after filtering.")
-            st.stop()
-    
-        # ---------- 3) Metric templates ----------
-        pos_cols = {
-            "CM": [
-                "Non-penalty goals per 90","xG per 90","xA per 90",
-                "Shot assists per 90","Touches in box per 90",
-                "Accurate passes, %","Accurate progressive passes, %","Progressive runs per 90",
-                "Accurate passes to final third, %","Accurate crosses, %",
-                "Successful defensive actions per 90","Defensive duels won, %",
-                "PAdj Sliding tackles","Shots blocked per 90","PAdj Interceptions"
-            ],
-            "LB": [
-                "Shot assists per 90","xA per 90","Assists per 90",
-                "xG per 90","Successful attacking actions per 90",
-                "Accurate passes, %","Accurate progressive passes, %","Crosses per 90",
-                "Accurate crosses, %","Progressive runs per 90",
-                "Successful defensive actions per 90","Defensive duels won, %",
-                "PAdj Sliding tackles","Shots blocked per 90","PAdj Interceptions"
-            ],
-            "RB": [
-                "Shot assists per 90","xA per 90","Assists per 90",
-                "xG per 90","Successful attacking actions per 90",
-                "Accurate passes, %","Accurate progressive passes, %","Crosses per 90",
-                "Accurate crosses, %","Progressive runs per 90",
-                "Successful defensive actions per 90","Defensive duels won, %",
-                "PAdj Sliding tackles","Shots blocked per 90","PAdj Interceptions"
-            ],
-            "CB": [
-                "Offensive duels won, %","Shot assists per 90","xA per 90",
-                "xG per 90","Non-penalty goals per 90",
-                "Accurate passes, %","Accurate lateral passes, %","Accurate short / medium passes, %",
-                "Progressive passes per 90","Accurate progressive passes, %",
-                "Defensive duels won, %","Successful defensive actions per 90",
-                "Aerial duels won, %","PAdj Interceptions","Shots blocked per 90"
-            ],
-            "CF": [
-                "Touches in box per 90","Shots per 90","Shots on target, %",
-                "xG per 90","Non-penalty goals per 90",
-                "Accurate passes, %","Accurate smart passes, %","Shot assists per 90",
-                "xA per 90","Assists per 90",
-                "Offensive duels per 90","Offensive duels won, %",
-                "Aerial duels won, %","Successful dribbles, %","Successful attacking actions per 90"
-            ],
-            "LW": [
-                "Touches in box per 90","Shots per 90","Shots on target, %",
-                "xG per 90","Non-penalty goals per 90",
-                "Progressive runs per 90","Accurate crosses, %","Shot assists per 90",
-                "xA per 90","Assists per 90",
-                "Offensive duels per 90","Offensive duels won, %",
-                "Dribbles per 90","Successful dribbles, %","Successful attacking actions per 90"
-            ],
-            "RW": [
-                "Touches in box per 90","Shots per 90","Shots on target, %",
-                "xG per 90","Non-penalty goals per 90",
-                "Progressive runs per 90","Accurate crosses, %","Shot assists per 90",
-                "xA per 90","Assists per 90",
-                "Offensive duels per 90","Offensive duels won, %",
-                "Dribbles per 90","Successful dribbles, %","Successful attacking actions per 90"
-            ],
-            "DM": [
-                "Successful attacking actions per 90","Shot assists per 90","xA per 90",
-                "Shots per 90","xG per 90",
-                "Accurate passes, %","Accurate short / medium passes, %","Accurate through passes, %",
-                "Progressive passes per 90","Accurate progressive passes, %",
-                "Successful defensive actions per 90","Defensive duels per 90",
-                "Defensive duels won, %","PAdj Sliding tackles","PAdj Interceptions"
-            ],
-            "AM": [
-                "Touches in box per 90","Shots per 90","Goal conversion, %",
-                "Non-penalty goals per 90","xG per 90",
-                "Accurate passes to penalty area, %","Accurate crosses, %","Shot assists per 90",
-                "xA per 90","Assists per 90",
-                "Offensive duels per 90","Offensive duels won, %","Successful attacking actions per 90",
-                "Dribbles per 90","Successful dribbles, %"
-            ],
-        }
-    
-        pos_params = {
-            "CM": [
-                "Non-penalty goals","xG","xA",
-                "Shot assists","Touches in box",
-                "Accurate passes %","\nAccurate progressive \npasses %","Progressive runs",
-                "\nAccurate passes \nto final third %","Accurate crosses %",
-                "\nSuccessful \ndefensive actions","\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles","Shots blocked","\nPAdj \nInterceptions"
-            ],
-            "LB": [
-                "Shot assists","xA","Assists",
-                "xG","\nSuccessful \nattacking actions",
-                "Accurate passes %","\nAccurate progressive \npasses %","Crosses",
-                "Accurate crosses %","Progressive runs",
-                "\nSuccessful \ndefensive actions","\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles","Shots blocked","\nPAdj \nInterceptions"
-            ],
-            "RB": [
-                "Shot assists","xA","Assists",
-                "xG","\nSuccessful \nattacking actions",
-                "Accurate passes %","\nAccurate progressive \npasses %","Crosses",
-                "Accurate crosses %","Progressive runs",
-                "\nSuccessful \ndefensive actions","\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles","Shots blocked","\nPAdj \nInterceptions"
-            ],
-            "CB": [
-                "\nOffensive \nduels won %","Shot assists","xA",
-                "xG","\nNon-penalty \ngoals",
-                "Accurate passes %","\nAccurate lateral \npasses %","\nAccurate short \n& medium passes %",
-                "\nProgressive \npasses","\nAccurate progressive \npasses %",
-                "\nDefensive \nduels won %","\nSuccessful \ndefensive actions",
-                "\nAerial \nduels won %","\nPAdj \nInterceptions","Shots blocked"
-            ],
-            "CF": [
-                "Touches in box","Shots","\nShots on \ntarget %",
-                "xG","Non-penalty goals",
-                "Accurate passes %","\nAccurate smart \npasses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %",
-                "\nAerial \nduels won %","\nSuccessful \ndribbles %","\nSuccessful \nattacking actions"
-            ],
-            "RW": [
-                "Touches in box","Shots","\nShots on \ntarget %",
-                "xG","Non-penalty goals",
-                "Progressive runs","Accurate crosses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %",
-                "Dribbles","\nSuccessful \ndribbles %","\nSuccessful \nattacking actions"
-            ],
-            "LW": [
-                "Touches in box","Shots","\nShots on \ntarget %",
-                "xG","Non-penalty goals",
-                "Progressive runs","Accurate crosses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %",
-                "Dribbles","\nSuccessful \ndribbles %","\nSuccessful \nattacking actions"
-            ],
-            "DM": [
-                "\nSuccessful \nattacking actions","Shot assists","xA",
-                "Shots","xG",
-                "Accurate passes %","\nAccurate \nshort/medium passes %","\nAccurate \nthrough passes %",
-                "\nProgressive \npasses","\nAccurate \nprogressive passes %",
-                "\nSuccessful \ndefensive actions","Defensive duels",
-                "\nDefensive \nduels won %","\nPAdj \nSliding tackles","\nPAdj \nInterceptions"
-            ],
-            "AM": [
-                "Touches in box","Shots","Goal conversion %",
-                "Non-penalty goals","xG",
-                "\nAccurate passes \nto penalty area %","\nAccurate \ncrosses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %","\nSuccessful \nattacking actions",
-                "Dribbles","\nSuccessful \ndribbles %"
-            ],
-        }
-    
-        cols = pos_cols.get(position, [])
-        params = pos_params.get(position, [])
-        if not cols:
-            st.warning(f"No radar metric template configured for position: {position}")
-            st.stop()
-    
-        # ---------- 4) Ensure numeric dtypes for metrics ----------
-        missing = [c for c in cols if c not in df.columns]
-        if missing:
-            st.error(f"Missing columns for {position}: {missing}")
-            st.stop()
-    
-        # coerce to numeric just in case
-        for c in cols:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    
-        # ---------- 5) Player row ----------
-        if "Player" not in df.columns:
-            st.error("Your data has no 'Player' column, cannot find the player.")
-            st.stop()
-    
-        if not playerrequest:
-            st.warning("Select a player to render the radar.")
-            st.stop()
-    
-        playerdata = df.loc[df["Player"] == playerrequest]
-        if playerdata.empty:
-            st.error(f"Player '{playerrequest}' not found in the filtered {position} dataset.")
-            st.stop()
-    
-        # ---------- 6) Build ranges, averages, player values ----------
-        low = df[cols].min().values.round(2).tolist()
-        high = df[cols].max().values.round(2).tolist()
-        league_avg = df[cols].mean().values.round(2).tolist()
-        player_vals = playerdata[cols].iloc[0].values.round(2).tolist()
-    
-        # ---------- 7) Radar figure ----------
-        font_normal = FontManager('https://raw.githubusercontent.com/googlefonts/roboto/main/src/hinted/Roboto-Regular.ttf')
-        font_italic = FontManager('https://raw.githubusercontent.com/googlefonts/roboto/main/src/hinted/Roboto-Italic.ttf')
-        font_bold = FontManager('https://raw.githubusercontent.com/google/fonts/main/apache/robotoslab/RobotoSlab[wght].ttf')
-    
-        radar = Radar(
-            params=params,
-            min_range=low,
-            max_range=high,
-            round_int=[False] * len(params),
-            num_rings=4,
-            ring_width=1,
-            center_circle_radius=1,
-        )
-    
-        fig, ax = radar.setup_axis()
-        fig.patch.set_facecolor('#F2F2F2')   # <--- full figure background
-        ax.set_facecolor('#F2F2F2')
-        radar.draw_circles(ax=ax, facecolor='#b3b3b3', edgecolor='#b3b3b3')
-    
-        # player vs league avg
-        radar.draw_radar_compare(
-            player_vals, league_avg, ax=ax,
-            kwargs_radar={'facecolor': '#ea5a00', 'alpha': 1},
-            kwargs_compare={'facecolor': '#004E89', 'alpha': 0.4}
-        )
-        radar.draw_range_labels(ax=ax, fontsize=10, fontproperties=font_italic.prop)
-        radar.draw_param_labels(ax=ax, fontsize=12.5, fontproperties=font_bold.prop, color='black')
-        radar.spoke(ax=ax, color='#a6a4a1', linestyle='--', zorder=2)
-    
-        # Title
-        ax_limits = ax.get_xlim(), ax.get_ylim()
-        cx = (ax_limits[0][0] + ax_limits[0][1]) / 2
-        ax.text(
-            cx, 6.65, f"{playerrequest} compared to {league} ({position}) average in {season}",
-            size=17, fontproperties=font_bold.prop, color="#000000",
-            ha="center", bbox=dict(facecolor='#f2f2f2', alpha=0.5, edgecolor='#f2f2f2')
-        )
-    
-        # Logos (safe if not provided)
-        try:
-            add_image(rdaimage, fig, left=0.775, bottom=0.725, width=0.15, height=0.15)
-        except Exception:
-            pass
-        try:
-            add_image(leagueimage, fig, left=0.135, bottom=0.115, width=0.125, height=0.125)
-        except Exception:
-            pass
-    
-        # Legend chips + captions
-        fig.text(0.17, 0.8525, f"{playerrequest}", size=10, fontproperties=font_bold.prop, color="#000000")
-        fig.text(0.17, 0.8275, "League Average", size=10, fontproperties=font_bold.prop, color="#000000")
-        fig.text(0.67, 0.12, "Data from Wyscout | Minimum 500 minutes played", size=8, fontproperties=font_bold.prop, color="#000000")
-        fig.patches.extend([
-            plt.Rectangle((0.15, 0.85), 0.015, 0.015, fill=True, color="#ea5a00", transform=fig.transFigure, figure=fig),
-            plt.Rectangle((0.15, 0.825), 0.015, 0.015, fill=True, color="#004E89", transform=fig.transFigure, figure=fig),
-        ])
-    
-        st.pyplot(fig)
+                if reference_leagues:
+                    reference = store.select(reference_leagues)
+            show_chart("pizza", percentiles=percentiles, reference=reference)
 
-    with tab_raw_pizza:
-        import numpy as np
-        import pandas as pd
-        import matplotlib.pyplot as plt
-        from mplsoccer import PyPizza, add_image, FontManager
-        import streamlit as st
-    
-        # --- 1) Base dataset (no rawdata!) ---
-        if "data_original" not in globals():
-            st.error("Internal setup error: `data_original` not found.")
-            st.stop()
-        df = data_original.copy()
-    
-        # --- 2) Clean up positions and filter by position + minutes ---
-        replacements = {
-            'LWF': 'LW','RWF':'RW','LCMF':'CM','RCMF':'CM',
-            'DMF':'DM','RDMF':'DM','LDMF':'DM','AMF':'AM',
-            'RAMF':'RW','LAMF':'LW','RCB':'CB','LCB':'CB',
-            'LWB':'LB','RWB':'RB'
-        }
-        if "Position" not in df.columns:
-            st.error("Your data has no 'Position' column.")
-            st.stop()
-    
-        df["Position"] = df["Position"].astype(str)
-        for src, dst in replacements.items():
-            df["Position"] = df["Position"].str.replace(fr"\b{src}\b", dst, regex=True)
-    
-        if not position:
-            st.warning("Select a position to build the Raw Pizza.")
-            st.stop()
-    
-        df = df[df["Position"].str.contains(fr"\b{position}\b", case=False, na=False)]
-        if "Minutes played" in df.columns and minutethreshold is not None:
-            df = df[df["Minutes played"] >= minutethreshold]
-    
-        if df.empty:
-            st.error(f"No rows for position '{position}' at the selected minute threshold.")
-            st.stop()
-    
-        if "Player" not in df.columns:
-            st.error("Your data has no 'Player' column.")
-            st.stop()
-    
-        playerdata = df.loc[df["Player"] == playerrequest]
-        if playerdata.empty:
-            st.error(f"Player '{playerrequest}' not found in the filtered {position} dataset.")
-            st.stop()
-    
-        # --- 3) Metric and label templates (copied from radar) ---
-        pos_cols = {
-            "CM": ["Non-penalty goals per 90","xG per 90","xA per 90",
-                   "Shot assists per 90","Touches in box per 90",
-                   "Accurate passes, %","Accurate progressive passes, %","Progressive runs per 90",
-                   "Accurate passes to final third, %","Accurate crosses, %",
-                   "Successful defensive actions per 90","Defensive duels won, %",
-                   "PAdj Sliding tackles","Shots blocked per 90","PAdj Interceptions"],
-            "LB": ["Shot assists per 90","xA per 90","Assists per 90",
-                   "xG per 90","Successful attacking actions per 90",
-                   "Accurate passes, %","Accurate progressive passes, %","Crosses per 90",
-                   "Accurate crosses, %","Progressive runs per 90",
-                   "Successful defensive actions per 90","Defensive duels won, %",
-                   "PAdj Sliding tackles","Shots blocked per 90","PAdj Interceptions"],
-            "RB": ["Shot assists per 90","xA per 90","Assists per 90",
-                   "xG per 90","Successful attacking actions per 90",
-                   "Accurate passes, %","Accurate progressive passes, %","Crosses per 90",
-                   "Accurate crosses, %","Progressive runs per 90",
-                   "Successful defensive actions per 90","Defensive duels won, %",
-                   "PAdj Sliding tackles","Shots blocked per 90","PAdj Interceptions"],
-            "CB": ["Offensive duels won, %","Shot assists per 90","xA per 90",
-                   "xG per 90","Non-penalty goals per 90",
-                   "Accurate passes, %","Accurate lateral passes, %","Accurate short / medium passes, %",
-                   "Progressive passes per 90","Accurate progressive passes, %",
-                   "Defensive duels won, %","Successful defensive actions per 90",
-                   "Aerial duels won, %","PAdj Interceptions","Shots blocked per 90"],
-            "CF": ["Touches in box per 90","Shots per 90","Shots on target, %",
-                   "xG per 90","Non-penalty goals per 90",
-                   "Accurate passes, %","Accurate smart passes, %","Shot assists per 90",
-                   "xA per 90","Assists per 90",
-                   "Offensive duels per 90","Offensive duels won, %",
-                   "Aerial duels won, %","Successful dribbles, %","Successful attacking actions per 90"],
-            "LW": ["Touches in box per 90","Shots per 90","Shots on target, %",
-                   "xG per 90","Non-penalty goals per 90",
-                   "Progressive runs per 90","Accurate crosses, %","Shot assists per 90",
-                   "xA per 90","Assists per 90",
-                   "Offensive duels per 90","Offensive duels won, %",
-                   "Dribbles per 90","Successful dribbles, %","Successful attacking actions per 90"],
-            "RW": ["Touches in box per 90","Shots per 90","Shots on target, %",
-                   "xG per 90","Non-penalty goals per 90",
-                   "Progressive runs per 90","Accurate crosses, %","Shot assists per 90",
-                   "xA per 90","Assists per 90",
-                   "Offensive duels per 90","Offensive duels won, %",
-                   "Dribbles per 90","Successful dribbles, %","Successful attacking actions per 90"],
-            "DM": ["Successful attacking actions per 90","Shot assists per 90","xA per 90",
-                   "Shots per 90","xG per 90",
-                   "Accurate passes, %","Accurate short / medium passes, %","Accurate through passes, %",
-                   "Progressive passes per 90","Accurate progressive passes, %",
-                   "Successful defensive actions per 90","Defensive duels per 90",
-                   "Defensive duels won, %","PAdj Sliding tackles","PAdj Interceptions"],
-            "AM": ["Touches in box per 90","Shots per 90","Goal conversion, %",
-                   "Non-penalty goals per 90","xG per 90",
-                   "Accurate passes to penalty area, %","Accurate crosses, %","Shot assists per 90",
-                   "xA per 90","Assists per 90",
-                   "Offensive duels per 90","Offensive duels won, %","Successful attacking actions per 90",
-                   "Dribbles per 90","Successful dribbles, %"]
-        }
-    
-        pos_params = {
-            "CM": [
-                "Non-penalty goals","xG","xA",
-                "Shot assists","Touches in box",
-                "Accurate passes %","\nAccurate progressive \npasses %","Progressive runs",
-                "\nAccurate passes \nto final third %","Accurate crosses %",
-                "\nSuccessful \ndefensive actions","\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles","Shots blocked","\nPAdj \nInterceptions"
-            ],
-            "LB": [
-                "Shot assists","xA","Assists",
-                "xG","\nSuccessful \nattacking actions",
-                "Accurate passes %","\nAccurate progressive \npasses %","Crosses",
-                "Accurate crosses %","Progressive runs",
-                "\nSuccessful \ndefensive actions","\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles","Shots blocked","\nPAdj \nInterceptions"
-            ],
-            "RB": [
-                "Shot assists","xA","Assists",
-                "xG","\nSuccessful \nattacking actions",
-                "Accurate passes %","\nAccurate progressive \npasses %","Crosses",
-                "Accurate crosses %","Progressive runs",
-                "\nSuccessful \ndefensive actions","\nDefensive \nduels won %",
-                "\nPAdj Sliding \ntackles","Shots blocked","\nPAdj \nInterceptions"
-            ],
-            "CB": [
-                "\nOffensive \nduels won %","Shot assists","xA",
-                "xG","\nNon-penalty \ngoals",
-                "Accurate passes %","\nAccurate lateral \npasses %","\nAccurate short \n& medium passes %",
-                "\nProgressive \npasses","\nAccurate progressive \npasses %",
-                "\nDefensive \nduels won %","\nSuccessful \ndefensive actions",
-                "\nAerial \nduels won %","\nPAdj \nInterceptions","Shots blocked"
-            ],
-            "CF": [
-                "Touches in box","Shots","\nShots on \ntarget %",
-                "xG","Non-penalty goals",
-                "Accurate passes %","\nAccurate smart \npasses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %",
-                "\nAerial \nduels won %","\nSuccessful \ndribbles %","\nSuccessful \nattacking actions"
-            ],
-            "RW": [
-                "Touches in box","Shots","\nShots on \ntarget %",
-                "xG","Non-penalty goals",
-                "Progressive runs","Accurate crosses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %",
-                "Dribbles","\nSuccessful \ndribbles %","\nSuccessful \nattacking actions"
-            ],
-            "LW": [
-                "Touches in box","Shots","\nShots on \ntarget %",
-                "xG","Non-penalty goals",
-                "Progressive runs","Accurate crosses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %",
-                "Dribbles","\nSuccessful \ndribbles %","\nSuccessful \nattacking actions"
-            ],
-            "DM": [
-                "\nSuccessful \nattacking actions","Shot assists","xA",
-                "Shots","xG",
-                "Accurate passes %","\nAccurate \nshort/medium passes %","\nAccurate \nthrough passes %",
-                "\nProgressive \npasses","\nAccurate \nprogressive passes %",
-                "\nSuccessful \ndefensive actions","Defensive duels",
-                "\nDefensive \nduels won %","\nPAdj \nSliding tackles","\nPAdj \nInterceptions"
-            ],
-            "AM": [
-                "Touches in box","Shots","Goal conversion %",
-                "Non-penalty goals","xG",
-                "\nAccurate passes \nto penalty area %","\nAccurate \ncrosses %","Shot assists",
-                "xA","Assists",
-                "Offensive duels","\nOffensive \nduels won %","\nSuccessful \nattacking actions",
-                "Dribbles","\nSuccessful \ndribbles %"
-            ],
-        }
-    
-        cols = pos_cols.get(position, [])
-        params = pos_params.get(position, [])
-        if not cols:
-            st.warning(f"No metric template configured for position: {position}")
-            st.stop()
-    
-        # --- 4) Ensure numeric + compute ranges ---
-        for c in cols:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-        low = df[cols].min().values.round(2).tolist()
-        high = df[cols].max().values.round(2).tolist()
-        values = playerdata[cols].iloc[0].values.round(2).tolist()
-    
-        # --- 5) Build PyPizza (Raw Metrics) ---
-        plt.close('all')
-        baker = PyPizza(
-            params=params,
-            min_range=low,
-            max_range=high,
-            background_color="#F2F2F2",
-            straight_line_color="#F2F2F2",
-            last_circle_color="#000000", last_circle_lw=2.5,
-            straight_line_lw=1,
-            other_circle_lw=0, other_circle_color="#000000",
-            inner_circle_size=20,
-        )
-    
-        slice_colors = ["#ea5a00"] * 5 + ["#004E89"] * 5 + ["#630101"] * 5
-        text_colors  = ["#000000"] * 10 + ["#F2F2F2"] * 5
-    
-        fig, ax = baker.make_pizza(
-            values,
-            figsize=(8, 8),
-            color_blank_space="same",
-            slice_colors=slice_colors,
-            value_colors=text_colors,
-            value_bck_colors=slice_colors,
-            blank_alpha=0.4,
-            param_location=110,
-            kwargs_slices=dict(edgecolor="#F2F2F2", linewidth=1),
-            kwargs_params=dict(color="#000000", fontsize=11, fontproperties=font_normal.prop, va="center"),
-            kwargs_values=dict(
-                color="#000000", fontsize=11, fontproperties=font_normal.prop, zorder=3,
-                bbox=dict(edgecolor="#000000", facecolor="cornflowerblue", boxstyle="round,pad=0.2", lw=1),
-            ),
-        )
-    
-        # --- 6) Title / credits / legend ---
-        team_col = "Team" if "Team" in playerdata.columns else (
-            "Team within selected timeframe" if "Team within selected timeframe" in playerdata.columns else None
-        )
-        teamname = playerdata[team_col].iloc[0] if team_col else ""
-    
-        fig.text(
-            0.515, 0.975, f'{playerrequest} - {teamname}',
-            size=16, ha="center", fontproperties=font_bold.prop, color="#000000"
-        )
-        fig.text(
-            0.515, 0.953, f'{league} | Season {season} | > {minutethreshold} mins | Compared with other {position}',
-            size=12, ha="center", fontproperties=font_bold.prop, color="#000000"
-        )
-    
-        CREDIT = "Data from Wyscout | Metrics are per 90 unless stated | Raw metrics"
-        fig.text(0.99, 0.02, CREDIT, size=9, fontproperties=font_italic.prop, color="#000000", ha="right")
-    
-        fig.text(
-            0.34, 0.925, "Attacking        Possession       Defending", size=14,
-            fontproperties=font_bold.prop, color="#000000"
-        )
-        fig.patches.extend([
-            plt.Rectangle((0.31, 0.9225), 0.025, 0.021, fill=True, color="#ea5a00", transform=fig.transFigure, figure=fig),
-            plt.Rectangle((0.462, 0.9225), 0.025, 0.021, fill=True, color="#004E89", transform=fig.transFigure, figure=fig),
-            plt.Rectangle((0.632, 0.9225), 0.025, 0.021, fill=True, color="#630101", transform=fig.transFigure, figure=fig),
-        ])
-    
-        try:
-            add_image(rdaimage, fig, left=0.87, bottom=0.85, width=0.15, height=0.15)
-            add_image(leagueimage, fig, left=0.05, bottom=0.01, width=0.125, height=0.125)
-        except Exception:
-            pass
-    
-        st.pyplot(fig, clear_figure=True)
+    if tab_is_open(tab_radar):
+        with tab_radar, stage("tab.radar"):
+            # Up to three more players from the cohort; ranges and average are computed once
+            # per (position, threshold), so each extra player is one value lookup
+            compare_with = st.multiselect(
+                "Compare with",
+                options=[k for k in dict.fromkeys(dataset.player_keys[cohort_rows]) if k != playerrequest],
+                format_func=lambda k: search_index.label(search_index.find(k)),
+                max_selections=3,
+            )
+            if not compare_with:
+                show_chart("radar")
+            elif st.radio("Layout", ["Overlay", "Side by side"], horizontal=True) == "Overlay":
+                try:
+                    png, _ = render_chart(
+                        dataset, "radar_compare", [playerrequest, *compare_with], position, league,
+                        season, minutethreshold, brand=rdaimage, logo=leagueimage,
+                    )
+                except ChartError as exc:
+                    st.warning(str(exc))
+                else:
+                    st.image(png)
+            else:
+                # a grid of single radars on the overlay's ranges and average, all blitted
+                # onto the one cached base
+                for start in range(0, len(compare_with) + 1, 2):
+                    row = [playerrequest, *compare_with][start:start + 2]
+                    for column, name in zip(st.columns(2), row):
+                        with column:
+                            try:
+                                png, _ = render_chart(
+                                    dataset, "radar", name, position, league, season,
+                                    minutethreshold, brand=rdaimage, logo=leagueimage,
+                                    cohort_radar=True,
+                                )
+                            except ChartError as exc:
+                                st.warning(str(exc))
+                            else:
+                                st.image(png)
+
+    if tab_is_open(tab_raw_pizza):
+        with tab_raw_pizza, stage("tab.raw_pizza"):
+            show_chart("raw_pizza")
+
+    if tab_is_open(tab_similar):
+        with tab_similar, stage("tab.similar"):
+            # Nearest neighbours on the template's percentile vector; the index is built
+            # once per (pool, position, minutes), each query is one matrix-vector product
+            if position in dataset.missing_template_columns:
+                st.warning(f"The {position} template can't be built from this file.")
+            else:
+                col_metric, col_count, col_scope = st.columns(3)
+                metric = col_metric.radio("Distance", ["cosine", "euclidean"], horizontal=True)
+                count = col_count.number_input("Players", min_value=1, max_value=100, value=10)
+                pool = None
+                if store is not None and col_scope.checkbox("Search all loaded leagues"):
+                    pool = store
+                st.dataframe(similar_players(
+                    dataset, playerrequest, position, minutethreshold,
+                    k=int(count), metric=metric, pool=pool,
+                ), hide_index=True)
 else:
     st.warning("Please upload an Excel file.")
+
+show_debug_panel()
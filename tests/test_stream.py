@@ -0,0 +1,51 @@
+import datetime
+import io
+
+import pandas as pd
+
+from wtanalysis.ingest import load_workbook
+from wtanalysis.stream import stream_workbook
+
+
+def _workbook():
+    frame = pd.DataFrame({
+        "Player": ["A. One", "A. One", "B. Two", "B. Two", "C. Three", "D. Four"],
+        "Team": ["Leeds", "Leeds", "Derby", "Derby", "Hull", "Hull"],
+        "Team within selected timeframe": ["Luton", "Leeds", "Derby", "Derby", "Hull", "Hull"],
+        "Position": ["CF", "CF", "LCMF, DMF", "RCMF", "CB", "GK"],
+        "Minutes played": [900, 600, 1200, 300, 1500, 700],
+        # the second chunk has no IDs at all, the last row none of its own
+        "Wyscout ID": [101, 101, None, None, 303, None],
+        "Birth date": [datetime.datetime(2000, 1, 2), datetime.datetime(2000, 1, 2),
+                       datetime.datetime(1998, 5, 6), datetime.datetime(1999, 7, 8),
+                       datetime.datetime(1995, 3, 4), datetime.datetime(2001, 9, 10)],
+        "Goals": [5, 3, 1, 0, 2, 0],
+    })
+    out = io.BytesIO()
+    frame.to_excel(out, index=False)
+    return out.getvalue()
+
+
+def test_streamed_and_full_loads_have_the_same_player_keys(monkeypatch):
+    monkeypatch.setenv("WTA_CACHE_DIR", "")
+    raw = _workbook()
+    full, _ = load_workbook(raw)
+    streamed = stream_workbook(raw, chunk_rows=2)
+    assert streamed.player_keys.tolist() == full.player_keys.tolist()
+    assert streamed.player_keys[0] == "id:101"
+    # one name, two birth dates: two players
+    assert streamed.player_keys[2] != streamed.player_keys[3]
+
+
+def test_minute_floor_counts_a_players_splits_together(monkeypatch):
+    monkeypatch.setenv("WTA_CACHE_DIR", "")
+    raw = _workbook()
+    full, _ = load_workbook(raw)
+    full = full.combined
+    kept = (full.frame["Minutes played"] >= 700).to_numpy()
+    streamed = stream_workbook(raw, min_minutes=700, chunk_rows=2).combined
+    assert streamed.player_keys.tolist() == full.player_keys[kept].tolist()
+    assert (streamed.frame["Minutes played"].tolist()
+            == full.frame["Minutes played"][kept].tolist())
+    # A. One's 900 + 600 minutes, though one split is under the floor
+    assert streamed.frame["Minutes played"].iloc[0] == 1500
@@ -0,0 +1,31 @@
+"""Data and chart helpers for the WT Analysis Wyscout app.
+
+The Streamlit script is a thin shell over this package: the expensive work
+(parsing workbooks, normalising positions, ranking, rendering) happens here,
+once per dataset instead of on every widget rerun, and the same pipeline is
+available headless through :mod:`wtanalysis.api` and ``python -m wtanalysis``.
+"""
+from .assets import (
+    LEAGUE_IMAGE_MAP, Font, brand_image, get_font, league_logo, load_fonts, logo_status,
+    prefill_logos,
+)
+from .cache import LRUCache, cache_stats
+from .dataset import Dataset
+from .dtypes import compact_frame
+from .ingest import dataset_from_frame, load_path, load_workbook, workbook_cache
+from .layers import ChartBase, base_cache, render_png
+from .percentiles import (
+    PercentileCube, ReferenceDistribution, cohort_percentiles, cohort_ranges, percentile_cache,
+    percentile_cube, range_cache, reference_distribution,
+)
+from .players import combine_frame, combine_rows, player_keys, season_line
+from .search import PlayerIndex, normalize
+from .similarity import SimilarityIndex, similar_players, similarity_cache, similarity_index
+from .stream import stream_columns, stream_workbook
+from .store import guess_tags, merge_cache, merge_workbooks
+from .templates import TEMPLATES, Template, TemplateError, load_templates
+from .timing import Timings, prometheus_text, stage
+from .api import (
+    ChartError, build_pizza, build_radar, build_radar_compare, build_raw_pizza, chart_cache,
+    render_chart,
+)
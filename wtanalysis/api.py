@@ -0,0 +1,322 @@
+"""Headless chart API: dataset + selections in, figure (or image bytes) out.
+
+This is everything the Streamlit tabs do, minus the widgets, so the same
+pipeline runs from notebooks, cron jobs, the command line and benchmarks::
+
+    from wtanalysis import load_path, build_pizza
+    png = build_pizza(load_path("prem.xlsx"), "C. Hudson-Odoi", "LW",
+                      league="Premier League", season="2024/25",
+                      min_minutes=900, fmt="png")
+"""
+import numpy as np
+import pandas as pd
+
+from .assets import brand_image, league_logo
+from .cache import LRUCache
+from .charts import (
+    COMPARE_COLORS, compare_radar_figure, figure_bytes, pizza_figure, radar_figure,
+    raw_pizza_figure,
+)
+from .dataset import Dataset, team_name
+from .ingest import dataset_from_frame
+from .layers import render_png
+from .percentiles import cohort_percentiles, cohort_ranges, reference_distribution
+from .players import season_line
+from .templates import TEMPLATES
+from .timing import stage
+
+
+# "use the default image" - distinct from None, which means "no image"
+DEFAULT = object()
+
+# Rendered PNGs keyed by everything that affects the picture; a chart is
+# ~150-250 KB at dpi=200, so 64 MB holds a few hundred.
+chart_cache = LRUCache(maxsize=1024, maxbytes=64 * 1024 * 1024, name="charts")
+
+# Same savefig settings st.pyplot uses, so cached images look identical
+PNG_DPI = 200
+
+
+class ChartError(ValueError):
+    """A chart can't be built for the given selections (shown to the user as-is)."""
+
+
+def as_dataset(data):
+    """Accept a :class:`Dataset` or a raw Wyscout DataFrame."""
+    if isinstance(data, Dataset):
+        return data
+    if isinstance(data, pd.DataFrame):
+        return dataset_from_frame(data)
+    raise TypeError(f"Expected a Dataset or DataFrame, got {type(data).__name__}")
+
+
+def _template(dataset, position, chart):
+    if not position:
+        raise ChartError(f"Pick a position to build the {chart}.")
+    template = TEMPLATES.get(position)
+    if template is None:
+        raise ChartError(f"No {chart} metric template configured for position: {position}")
+    indices, missing = dataset.template_columns[position]
+    if missing:
+        raise ChartError(f"Missing columns for {position}: {missing}")
+    return template, indices
+
+
+def _metric_values(row, indices):
+    # raw metric values of one player row, by the template's resolved column positions
+    values = pd.to_numeric(row.iloc[indices], errors="coerce").astype(float)
+    return values.values.round(2).tolist()
+
+
+def _player_rows(dataset, rows, player, position):
+    # the frame rows of ``player`` (a key or a name) among the cohort's row numbers
+    if not player:
+        raise ChartError("Select a player to build the chart.")
+    found = dataset.player_rows(player, rows)
+    if not len(found):
+        raise ChartError(f"Player '{dataset.player_name(player)}' not found in the filtered "
+                         f"{position} dataset.")
+    return dataset.frame.iloc[found]
+
+
+def reference_label(reference, max_leagues=3):
+    """How a pooled reference population reads in a chart subtitle."""
+    leagues = reference.leagues
+    if not leagues:
+        return None
+    if len(leagues) > max_leagues:
+        return f"{len(leagues)} leagues"
+    return ", ".join(leagues)
+
+
+def pizza_inputs(data, player, position, min_minutes=0, percentiles=None, reference=None,
+                 aggregate=False):
+    """Labels, categories, percentile values, team and reference label for the Pizza.
+
+    With a ``reference`` dataset (e.g. several leagues of a merged store)
+    the player is ranked against that pooled cohort instead of their own.
+    ``player`` is a player key or a name; ``aggregate`` combines a
+    transferred player's splits (:func:`~wtanalysis.players.season_line`).
+    """
+    dataset = as_dataset(data)
+    template, indices = _template(dataset, position, "pizza")
+    cols = list(template.columns)
+    cohort_rows = dataset.cohort_rows(position, min_minutes)
+    if not len(cohort_rows):
+        raise ChartError("No players found for that position or below the minute threshold.")
+    rows = _player_rows(dataset, cohort_rows, player, position)
+    row = season_line(rows, aggregate)
+    label = None
+    if reference is not None or (aggregate and len(rows) > 1):
+        # a combined line isn't a cohort row, so it is ranked like a pooled reference
+        pool = dataset if reference is None else as_dataset(reference)
+        distribution = reference_distribution(pool, position, min_minutes, cols)
+        if not len(distribution):
+            raise ChartError(f"No {position} players in the reference leagues at that minute threshold.")
+        player_values = pd.to_numeric(row.iloc[indices], errors="coerce").to_numpy(dtype=float)
+        ranks = distribution.percentiles(player_values[None, :])[0]
+        values = np.round(ranks).astype(int).tolist()
+        if reference is not None:
+            label = reference_label(pool)
+    else:
+        if percentiles is None:
+            percentiles = cohort_percentiles(dataset, position, min_minutes, cols)
+        values = percentiles.loc[row.name, cols].round(0).astype(int).tolist()
+    return dict(params=list(template.labels), categories=list(template.categories),
+                values=values, team=row["Team"], reference_label=label, player=row["Player"])
+
+
+def radar_inputs(data, player, position, min_minutes=None, aggregate=False):
+    """Labels, ranges, player values and cohort average for the Radar.
+
+    By default the Radar compares against every player at the position,
+    whatever their minutes; with ``min_minutes`` it uses the same cohort -
+    and so the same ranges and average - as :func:`compare_inputs`.
+    """
+    dataset = as_dataset(data)
+    template, indices = _template(dataset, position, "radar")
+    if min_minutes is None:
+        cohort_rows = dataset.rows_for_position(position)
+        if not len(cohort_rows):
+            raise ChartError(f"No rows for position '{position}' after filtering.")
+    else:
+        cohort_rows = dataset.cohort_rows(position, min_minutes)
+        if not len(cohort_rows):
+            raise ChartError("No players found for that position or below the minute threshold.")
+    row = season_line(_player_rows(dataset, cohort_rows, player, position), aggregate)
+    low, high, average = cohort_ranges(dataset, position, min_minutes, template.columns)
+    return dict(params=list(template.labels), low=low, high=high,
+                values=_metric_values(row, indices), average=average, player=row["Player"])
+
+
+def compare_inputs(data, players, position, min_minutes=0, aggregate=False):
+    """Labels, ranges, cohort average and per-player values for the comparison Radar.
+
+    Ranges and average come from :func:`~wtanalysis.percentiles.cohort_ranges`,
+    computed once per (position, threshold); each player then costs one
+    value lookup. ``values`` is ``[(player name, values), ...]`` in
+    ``players`` order.
+    """
+    dataset = as_dataset(data)
+    template, indices = _template(dataset, position, "comparison radar")
+    players = list(dict.fromkeys(p for p in players if p))
+    if not players:
+        raise ChartError("Select players to compare.")
+    if len(players) > len(COMPARE_COLORS):
+        raise ChartError(f"Compare at most {len(COMPARE_COLORS)} players at a time.")
+    cohort_rows = dataset.cohort_rows(position, min_minutes)
+    if not len(cohort_rows):
+        raise ChartError("No players found for that position or below the minute threshold.")
+    low, high, average = cohort_ranges(dataset, position, min_minutes, template.columns)
+    values = []
+    for player in players:
+        row = season_line(_player_rows(dataset, cohort_rows, player, position), aggregate)
+        values.append((row["Player"], _metric_values(row, indices)))
+    return dict(params=list(template.labels), low=low, high=high, average=average,
+                values=values)
+
+
+def raw_pizza_inputs(data, player, position, min_minutes=0, aggregate=False):
+    """Labels, categories, ranges, raw values and team for the Raw Pizza."""
+    dataset = as_dataset(data)
+    template, indices = _template(dataset, position, "Raw Pizza")
+    cohort_rows = dataset.cohort_rows(position, min_minutes)
+    if not len(cohort_rows):
+        raise ChartError(f"No rows for position '{position}' at the selected minute threshold.")
+    row = season_line(_player_rows(dataset, cohort_rows, player, position), aggregate)
+    low, high, _ = cohort_ranges(dataset, position, min_minutes, template.columns)
+    return dict(params=list(template.labels), categories=list(template.categories),
+                low=low, high=high, values=_metric_values(row, indices),
+                team=team_name(row), player=row["Player"])
+
+
+def _images(league, brand, logo):
+    if brand is DEFAULT:
+        brand = brand_image()
+    if logo is DEFAULT:
+        logo = league_logo(league) if league else None
+    return brand, logo
+
+
+def _finish(fig, fmt):
+    return figure_bytes(fig, fmt=fmt) if fmt else fig
+
+
+def build_pizza(data, player, position, league="", season="", min_minutes=0, fmt=None,
+                percentiles=None, brand=DEFAULT, logo=DEFAULT, reference=None, aggregate=False):
+    """Percentile Pizza for ``player``; a Figure, or ``fmt`` ("png"/"pdf") bytes.
+
+    ``percentiles`` lets a caller pass precomputed cohort ranks (e.g. from a
+    :class:`~wtanalysis.percentiles.PercentileCube`); by default they come
+    from the memoised :func:`~wtanalysis.percentiles.cohort_percentiles`.
+    ``reference`` ranks the player against another (pooled) dataset instead,
+    and ``aggregate`` combines a transferred player's splits.
+    """
+    inputs = pizza_inputs(data, player, position, min_minutes, percentiles, reference, aggregate)
+    brand, logo = _images(league, brand, logo)
+    fig = pizza_figure(inputs["params"], inputs["values"], inputs["player"], inputs["team"],
+                       position, league, season, min_minutes, brand=brand, logo=logo,
+                       categories=inputs["categories"], reference_label=inputs["reference_label"])
+    return _finish(fig, fmt)
+
+
+def build_radar(data, player, position, league="", season="", min_minutes=None, fmt=None,
+                brand=DEFAULT, logo=DEFAULT, aggregate=False):
+    """Radar of ``player`` against the position average; a Figure, or ``fmt`` bytes.
+
+    ``min_minutes`` limits the cohort the ranges and average come from (see
+    :func:`radar_inputs`).
+    """
+    inputs = radar_inputs(data, player, position, min_minutes, aggregate)
+    brand, logo = _images(league, brand, logo)
+    fig = radar_figure(inputs["params"], inputs["low"], inputs["high"], inputs["values"],
+                       inputs["average"], inputs["player"], position, league, season,
+                       brand=brand, logo=logo, min_minutes=min_minutes)
+    return _finish(fig, fmt)
+
+
+def build_radar_compare(data, players, position, league="", season="", min_minutes=0, fmt=None,
+                        brand=DEFAULT, logo=DEFAULT, aggregate=False):
+    """One Radar of up to four ``players`` over the cohort average; a Figure, or ``fmt`` bytes."""
+    inputs = compare_inputs(data, players, position, min_minutes, aggregate)
+    brand, logo = _images(league, brand, logo)
+    fig = compare_radar_figure(inputs["params"], inputs["low"], inputs["high"], inputs["values"],
+                               inputs["average"], position, league, season, min_minutes,
+                               brand=brand, logo=logo)
+    return _finish(fig, fmt)
+
+
+def build_raw_pizza(data, player, position, league="", season="", min_minutes=0, fmt=None,
+                    brand=DEFAULT, logo=DEFAULT, aggregate=False):
+    """Raw-metric Pizza for ``player``; a Figure, or ``fmt`` bytes."""
+    inputs = raw_pizza_inputs(data, player, position, min_minutes, aggregate)
+    brand, logo = _images(league, brand, logo)
+    fig = raw_pizza_figure(inputs["params"], inputs["low"], inputs["high"], inputs["values"],
+                           inputs["player"], inputs["team"], position, league, season, min_minutes,
+                           brand=brand, logo=logo, categories=inputs["categories"])
+    return _finish(fig, fmt)
+
+
+def render_chart(data, chart, player, position, league="", season="", min_minutes=0,
+                 percentiles=None, brand=DEFAULT, logo=DEFAULT, reference=None, aggregate=False,
+                 cohort_radar=False):
+    """PNG bytes for ``chart`` ("pizza", "radar", "raw_pizza" or "radar_compare"), cached.
+
+    Returns ``(png, from_cache)``. Charts are keyed by dataset hash, chart
+    type, player, position, league, season and minute threshold (the Radar
+    ignores the threshold unless ``cohort_radar``, which draws it on the
+    comparison Radar's ranges and average so radars of one comparison
+    line up), plus whether the images were present - a chart
+    rendered before its league logo arrived is re-rendered once it has.
+    A Pizza against a pooled ``reference`` is keyed by that dataset too.
+    Players are keys or names; for "radar_compare", ``player`` is the list of
+    players to compare. ``aggregate`` combines transfer splits (:func:`~wtanalysis.players.season_line`).
+    Misses are blitted onto a cached chart base (:mod:`wtanalysis.layers`),
+    so only the player layer is drawn.
+    """
+    dataset = as_dataset(data)
+    brand, logo = _images(league, brand, logo)
+    if chart != "pizza" or reference is None:
+        reference = None
+    else:
+        reference = as_dataset(reference)
+    if chart == "radar_compare":
+        player = tuple(player)
+    if chart == "radar" and not cohort_radar:
+        min_minutes = None
+    key = (dataset.key, chart, player, position, league, season,
+           min_minutes, brand is not None, logo is not None,
+           reference.key if reference is not None else None, aggregate)
+
+    def render():
+        with stage(f"chart.inputs.{chart}"):
+            if chart == "pizza":
+                inputs = pizza_inputs(dataset, player, position, min_minutes, percentiles,
+                                      reference, aggregate)
+                static = dict(min_minutes=min_minutes, categories=inputs["categories"],
+                              reference_label=inputs["reference_label"])
+                layer = dict(values=inputs["values"], player=inputs["player"],
+                             team=inputs["team"])
+            elif chart == "radar":
+                inputs = radar_inputs(dataset, player, position, min_minutes, aggregate)
+                static = dict(low=inputs["low"], high=inputs["high"],
+                              average_vals=inputs["average"], min_minutes=min_minutes)
+                layer = dict(player_vals=inputs["values"], player=inputs["player"])
+            elif chart == "radar_compare":
+                inputs = compare_inputs(dataset, player, position, min_minutes, aggregate)
+                static = dict(low=inputs["low"], high=inputs["high"],
+                              average_vals=inputs["average"], min_minutes=min_minutes)
+                layer = dict(players=inputs["values"])
+            elif chart == "raw_pizza":
+                inputs = raw_pizza_inputs(dataset, player, position, min_minutes, aggregate)
+                static = dict(low=inputs["low"], high=inputs["high"], min_minutes=min_minutes,
+                              categories=inputs["categories"])
+                layer = dict(values=inputs["values"], player=inputs["player"],
+                             team=inputs["team"])
+            else:
+                raise ValueError(f"Unknown chart type: {chart}")
+        static.update(params=inputs["params"], position=position, league=league, season=season,
+                      brand=brand, logo=logo)
+        return render_png(chart, static, layer, dpi=PNG_DPI)
+
+    return chart_cache.get_or_create(key, render)
@@ -0,0 +1,318 @@
+"""Fonts and images shared by every chart, resolved locally and loaded once.
+
+Fonts
+-----
+
+Fonts are looked up, in order, in ``WTA_FONT_DIR``, the bundled
+``wtanalysis/fonts`` directory and the font cache under the disk cache root
+(``~/.cache/wtanalysis/fonts`` by default). Only if none has the file is it
+downloaded - into that cache, so it happens once per machine - and that
+fallback can be switched off with ``WTA_FONT_DOWNLOAD=0`` for
+egress-restricted hosts. A font that can't be found or fetched falls back
+to matplotlib's default font rather than breaking the chart.
+
+Images
+------
+The brand image and league logos are decoded once and kept in a bounded
+in-memory cache. Logos are read from ``WTA_LOGO_DIR``, the bundled
+``wtanalysis/logos`` directory or the logo cache (files named like the CDN
+asset, e.g. ``5_140x140.png``); only missing ones are fetched from the
+Wyscout CDN, on a background thread with a short wait so a slow CDN leaves
+the logo off the chart instead of stalling it.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.request import urlopen
+
+from matplotlib.font_manager import FontProperties
+from PIL import Image
+
+from .cache import LRUCache, cache_root
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+FONT_FILES = {
+    "normal": "Roboto-Regular.ttf",
+    "italic": "Roboto-Italic.ttf",
+    "bold": "RobotoSlab[wght].ttf",
+}
+
+FONT_URLS = {
+    "normal": "https://raw.githubusercontent.com/googlefonts/roboto/main/src/hinted/Roboto-Regular.ttf",
+    "italic": "https://raw.githubusercontent.com/googlefonts/roboto/main/src/hinted/Roboto-Italic.ttf",
+    "bold": "https://raw.githubusercontent.com/google/fonts/main/apache/robotoslab/RobotoSlab[wght].ttf",
+}
+
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(__file__), "fonts")
+
+DOWNLOAD_TIMEOUT = 10
+
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+
+class Font:
+    """A loaded font; ``prop`` is what matplotlib text calls take.
+
+    Mirrors the ``.prop`` attribute of mplsoccer's ``FontManager`` so chart
+    code can use either.
+    """
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path
+        self.prop = FontProperties(fname=path) if path else FontProperties()
+
+    def __repr__(self):
+        return f"Font({self.name!r}, path={self.path!r})"
+
+
+def _font_cache_dir():
+    root = cache_root()
+    return os.path.join(root, "fonts") if root else None
+
+
+def font_dirs():
+    """Directories searched for font files, in priority order."""
+    dirs = [os.environ.get("WTA_FONT_DIR"), BUNDLED_FONT_DIR, _font_cache_dir()]
+    return [d for d in dirs if d]
+
+
+def _download(name, filename):
+    if os.environ.get("WTA_FONT_DOWNLOAD", "1") == "0":
+        return None
+    directory = _font_cache_dir()
+    if directory is None:
+        return None
+    path = os.path.join(directory, filename)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with stage("font.download"), \
+                urlopen(FONT_URLS[name], timeout=DOWNLOAD_TIMEOUT) as response:
+            data = response.read()
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except OSError as exc:
+        logger.warning("Could not download font %s: %s", filename, exc)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    return path
+
+
+def _resolve(name):
+    filename = FONT_FILES[name]
+    for directory in font_dirs():
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return _download(name, filename)
+
+
+def get_font(name):
+    """Return the :class:`Font` for ``"normal"``, ``"italic"`` or ``"bold"``."""
+    with _fonts_lock:
+        if name not in _fonts:
+            path = _resolve(name)
+            if path is None:
+                logger.warning("Font %s not available locally; using the default font",
+                               FONT_FILES[name])
+            _fonts[name] = Font(name, path)
+        return _fonts[name]
+
+
+def load_fonts():
+    """``(normal, italic, bold)`` fonts, loaded once per process."""
+    return get_font("normal"), get_font("italic"), get_font("bold")
+
+
+# ---- Images ----
+
+BRAND_IMAGE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "wtatransnew.png")
+
+# Define a dictionary mapping leagues to their image URLs
+LEAGUE_IMAGE_MAP = {
+    "Premier League": "https://cdn5.wyscout.com/photos/competition/public/5_140x140.png",
+    "League One": "https://cdn5.wyscout.com/photos/competition/public/64_140x140.png",
+    "Championship": "https://cdn5.wyscout.com/photos/competition/public/18_140x140.png",
+    "Serie A": "https://cdn5.wyscout.com/photos/competition/public/1_140x140.png",
+    "League Two": "https://cdn5.wyscout.com/photos/competition/public/67_140x140.png",
+    "Scottish Premiership": "https://cdn5.wyscout.com/photos/competition/public/17_140x140.png",
+    "MLS": "https://cdn5.wyscout.com/photos/competition/public/324_140x140.png",
+    "WSL": "https://cdn5.wyscout.com/photos/competition/public/g886_140x140.png",
+    "WSL2": "https://cdn5.wyscout.com/photos/competition/public/g1330_140x140.png",
+    "Women's National League": "https://cdn5.wyscout.com/photos/competition/public/g327_140x140.png",
+    "PGA League": "https://cdn5.wyscout.com/photos/competition/public/g-557_140x140.png",
+    "Women's A-League": "https://cdn5.wyscout.com/photos/competition/public/g370_140x140.png",
+    "USL Super League": "https://cdn5.wyscout.com/photos/competition/public/g-985_140x140.png",
+    "La Liga": "https://cdn5.wyscout.com/photos/competition/public/4_140x140.png",
+    "Bundesliga": "https://cdn5.wyscout.com/photos/competition/public/2_140x140.png",
+    "Bundesliga Two": "https://cdn5.wyscout.com/photos/competition/public/19_140x140.png",
+    "Ligue 1": "https://cdn5.wyscout.com/photos/competition/public/3_140x140.png",
+    "Pro League": "https://cdn5.wyscout.com/photos/competition/public/28_140x140.png",
+    "Liga Portugal": "https://cdn5.wyscout.com/photos/competition/public/9_140x140.png",
+    "National League": "https://cdn5.wyscout.com/photos/competition/public/135_140x140.png",
+    "National League N/S": "https://cdn5.wyscout.com/photos/competition/public/135_140x140.png",
+    "English 7th Tier": "https://cdn5.wyscout.com/photos/competition/public/555_140x140.png",
+    "U18 Premier League": "https://cdn5.wyscout.com/photos/competition/public/g950_140x140.png",
+    "Premier League 2": "https://cdn5.wyscout.com/photos/competition/public/g1592_140x140.png",
+    "Professional Development League": "https://cdn5.wyscout.com/photos/competition/public/g1191_140x140.png",
+    "INT-FIFACWC": "https://cdn5.wyscout.com/photos/competition/public/g72_140x140.png"
+}
+
+BUNDLED_LOGO_DIR = os.path.join(os.path.dirname(__file__), "logos")
+
+# How long a chart waits for a logo that has to come from the CDN
+LOGO_WAIT = 2.0
+# Don't hammer the CDN when it's unreachable: retry a failed logo after this
+LOGO_RETRY_AFTER = 300
+
+# Decoded images keyed by source (path or URL); logos are ~140x140 RGBA
+image_cache = LRUCache(maxsize=64, name="images")
+
+_logo_fetcher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="logo-fetch")
+_pending = {}
+_failed = {}
+_pending_lock = threading.Lock()
+
+
+def _open_image(source):
+    with stage("image.decode"):
+        image = Image.open(source)
+        image.load()  # decode now, not on first draw
+    return image
+
+
+def _logo_cache_dir():
+    root = cache_root()
+    return os.path.join(root, "logos") if root else None
+
+
+def logo_dirs():
+    """Directories searched for league logo files, in priority order."""
+    dirs = [os.environ.get("WTA_LOGO_DIR"), BUNDLED_LOGO_DIR, _logo_cache_dir()]
+    return [d for d in dirs if d]
+
+
+def _logo_filename(url):
+    return url.rsplit("/", 1)[-1]
+
+
+def _local_logo(url):
+    filename = _logo_filename(url)
+    for directory in logo_dirs():
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _fetch_logo(url):
+    with stage("logo.download"), urlopen(url, timeout=LOGO_WAIT * 5) as response:
+        data = response.read()
+    directory = _logo_cache_dir()
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, _logo_filename(url))
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("Could not cache logo %s: %s", url, exc)
+    image = _open_image(io.BytesIO(data))
+    image_cache.put(url, image)
+    return image
+
+
+def brand_image():
+    """The WT Analysis brand image, decoded once."""
+    return image_cache.get_or_create(BRAND_IMAGE, lambda: _open_image(BRAND_IMAGE))[0]
+
+
+def league_logo(league, wait=LOGO_WAIT):
+    """Decoded logo for ``league``, or ``None`` if unknown or not available in time.
+
+    A logo that has to be downloaded is fetched in the background; if it
+    isn't there within ``wait`` seconds this returns ``None`` and a later
+    call picks it up from the cache once the fetch finishes.
+    """
+    url = LEAGUE_IMAGE_MAP.get(league)
+    if not url:
+        return None
+    image = image_cache.get(url)
+    if image is not None:
+        return image
+    path = _local_logo(url)
+    if path is not None:
+        image = _open_image(path)
+        image_cache.put(url, image)
+        return image
+    with _pending_lock:
+        if time.monotonic() - _failed.get(url, -LOGO_RETRY_AFTER) < LOGO_RETRY_AFTER:
+            return None
+        future = _pending.get(url)
+        if future is None:
+            future = _pending[url] = _logo_fetcher.submit(_fetch_logo, url)
+    try:
+        # the part of a download the rerun actually waits for
+        with stage("logo.wait"):
+            return future.result(timeout=wait)
+    except FutureTimeout:
+        return None
+    except Exception as exc:  # network errors, bad image data
+        logger.warning("Could not fetch logo for %s: %s", league, exc)
+        with _pending_lock:
+            _failed[url] = time.monotonic()
+        return None
+    finally:
+        if future.done():
+            with _pending_lock:
+                _pending.pop(url, None)
+
+
+def logo_status(league):
+    """Why :func:`league_logo` has or hasn't got a logo for ``league``.
+
+    One of ``"unknown"`` (no logo mapped for the league), ``"ready"``,
+    ``"pending"`` (a download is still in flight) or ``"failed"`` (the last
+    download failed, and is not retried yet). Nothing is fetched.
+    """
+    url = LEAGUE_IMAGE_MAP.get(league)
+    if not url:
+        return "unknown"
+    if url in image_cache or _local_logo(url) is not None:
+        return "ready"
+    with _pending_lock:
+        if time.monotonic() - _failed.get(url, -LOGO_RETRY_AFTER) < LOGO_RETRY_AFTER:
+            return "failed"
+        future = _pending.get(url)
+    if future is not None and future.done():
+        return "failed" if future.exception() is not None else "ready"
+    return "pending"
+
+
+def prefill_logos(directory=None):
+    """Decode every league logo available locally into the image cache.
+
+    Reads from ``directory`` if given, otherwise from :func:`logo_dirs`.
+    Nothing is downloaded. Returns the number of logos now cached.
+    """
+    dirs = [directory] if directory else logo_dirs()
+    for url in set(LEAGUE_IMAGE_MAP.values()):
+        if url in image_cache:
+            continue
+        for d in dirs:
+            path = os.path.join(d, _logo_filename(url))
+            if os.path.exists(path):
+                image_cache.put(url, _open_image(path))
+                break
+    return sum(url in image_cache for url in set(LEAGUE_IMAGE_MAP.values()))
@@ -0,0 +1,158 @@
+"""Batch export: every chart for every player in a cohort, zipped.
+
+The cohort's inputs (percentiles, ranges, averages) are computed once in the
+calling process; only figure rendering - the slow, single-threaded
+matplotlib part - is farmed out to a process pool, where each worker reuses
+its chart bases (:mod:`wtanalysis.layers`) across players.
+"""
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .api import PNG_DPI
+from .assets import brand_image, league_logo
+from .dataset import team_name
+from .charts import figure_bytes
+from .layers import chart_figure, render_png
+from .percentiles import cohort_percentiles, cohort_ranges
+from .templates import TEMPLATES
+
+CHART_TYPES = ("pizza", "radar", "raw_pizza")
+
+
+def _slug(text):
+    return re.sub(r"[^0-9A-Za-z]+", "_", str(text)).strip("_") or "player"
+
+
+def cohort_jobs(dataset, position, min_minutes, league, season, charts=CHART_TYPES):
+    """One render job (a plain, picklable dict) per player and chart type."""
+    template = TEMPLATES.get(position)
+    if template is None:
+        raise ValueError(f"No metric template configured for position: {position}")
+    missing = dataset.template_columns[position][1]
+    if missing:
+        raise ValueError(f"Missing columns for {position}: {missing}")
+    cols = list(template.columns)
+    params, categories = list(template.labels), list(template.categories)
+    frame = dataset.frame
+    rows = dataset.cohort_rows(position, min_minutes)
+    cohort = frame.iloc[rows]
+    common = dict(position=position, league=league, season=season)
+
+    if "pizza" in charts:
+        percentiles = cohort_percentiles(dataset, position, min_minutes, cols)
+        pizza_values = percentiles.round(0).astype(int)
+    if "radar" in charts:
+        # the Radar compares against everyone at the position, whatever their minutes
+        radar_low, radar_high, radar_avg = cohort_ranges(dataset, position, None, cols)
+    if "raw_pizza" in charts:
+        raw_low, raw_high, _ = cohort_ranges(dataset, position, min_minutes, cols)
+
+    numeric = cohort[cols].apply(pd.to_numeric, errors="coerce").astype(float).round(2)
+    jobs = []
+    seen = set()
+    for label, row in cohort.iterrows():
+        player = row["Player"]
+        team = team_name(row)
+        stem = f"{_slug(player)}_{_slug(team)}"
+        if stem in seen:
+            stem = f"{stem}_{label}"
+        seen.add(stem)
+        values = numeric.loc[label].tolist()
+        if "pizza" in charts:
+            jobs.append(dict(common, chart="pizza", stem=stem, player=player, team=team,
+                             params=params, categories=categories,
+                             values=pizza_values.loc[label].tolist(), min_minutes=min_minutes))
+        if "radar" in charts:
+            jobs.append(dict(common, chart="radar", stem=stem, player=player,
+                             params=params, low=radar_low, high=radar_high,
+                             values=values, average=radar_avg))
+        if "raw_pizza" in charts:
+            jobs.append(dict(common, chart="raw_pizza", stem=stem, player=player, team=team,
+                             params=params, categories=categories, low=raw_low, high=raw_high,
+                             values=values, min_minutes=min_minutes))
+    return jobs
+
+
+def job_layers(job, brand=None, logo=None):
+    """Split a job into the static inputs of its chart base and its player layer."""
+    static = dict(params=job["params"], position=job["position"], league=job["league"],
+                  season=job["season"], brand=brand, logo=logo)
+    if job["chart"] == "pizza":
+        static.update(min_minutes=job["min_minutes"], categories=job["categories"])
+        player = dict(values=job["values"], player=job["player"], team=job["team"])
+    elif job["chart"] == "radar":
+        static.update(low=job["low"], high=job["high"], average_vals=job["average"])
+        player = dict(player_vals=job["values"], player=job["player"])
+    else:
+        static.update(low=job["low"], high=job["high"], min_minutes=job["min_minutes"],
+                      categories=job["categories"])
+        player = dict(values=job["values"], player=job["player"], team=job["team"])
+    return static, player
+
+
+def render_job(job, formats=("png",)):
+    """Render one job to ``[(archive name, bytes), ...]``, one entry per format.
+
+    PNGs are blitted onto a cached chart base, so a worker only draws the
+    static part of each (chart, position) once; other formats get a full figure.
+    """
+    brand = brand_image()
+    logo = league_logo(job["league"]) if job["league"] else None
+    static, player = job_layers(job, brand, logo)
+    files = []
+    vector = [fmt for fmt in formats if fmt != "png"]
+    if "png" in formats:
+        png = render_png(job["chart"], static, player, dpi=PNG_DPI)
+        files.append((f"{job['chart']}/{job['stem']}.png", png))
+    if vector:
+        fig = chart_figure(job["chart"], static, player)
+        last = len(vector) - 1
+        files.extend((f"{job['chart']}/{job['stem']}.{fmt}", figure_bytes(fig, fmt=fmt, close=i == last))
+                     for i, fmt in enumerate(vector))
+    return files
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render_job_with_formats(args):
+    job, formats = args
+    return render_job(job, formats)
+
+
+def export_batch(dataset, position, min_minutes, league, season, out,
+                 charts=CHART_TYPES, formats=("png",), workers=None):
+    """Render ``charts`` for every ``position`` player above ``min_minutes`` into a zip.
+
+    ``out`` is a path or writable binary file object. ``workers`` is the
+    size of the process pool (default: one per CPU); pass ``1`` to render in
+    this process. Returns the number of files written.
+    """
+    jobs = cohort_jobs(dataset, position, min_minutes, league, season, charts)
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as archive:
+        if workers == 1 or len(jobs) <= 1:
+            for files in (render_job(job, formats) for job in jobs):
+                for name, data in files:
+                    archive.writestr(name, data)
+                    written += 1
+            return written
+        # spawn, not fork: the Streamlit server is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            tasks = ((job, tuple(formats)) for job in jobs)
+            for files in pool.map(_render_job_with_formats, tasks, chunksize=chunksize):
+                for name, data in files:
+                    archive.writestr(name, data)
+                    written += 1
+    return written
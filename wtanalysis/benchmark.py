@@ -0,0 +1,181 @@
+"""Timings of the app's pipeline on synthetic Wyscout-shaped workbooks.
+
+``python -m wtanalysis bench`` builds workbooks of 1k, 10k and 50k rows
+(every template column, realistic ``Position`` strings such as
+"LCMF, DMF") and times each stage on its own: ``read_excel``, position
+splitting and indexing, the player-position map and lookups, percentile
+ranking, and each chart's full render and blitted render. Results go to a
+JSON file, one record per (rows, stage), so runs can be compared over time.
+
+Everything runs offline: fonts are never downloaded (matplotlib's default
+font stands in for missing ones), charts are drawn without logos, and no
+disk cache is read or written.
+"""
+import io
+import json
+import os
+import platform
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+# Position strings as they appear in exports: primary first, up to three more
+POSITION_STRINGS = (
+    "GK", "RCB", "LCB", "LCB, RCB", "CB, RCB", "LB", "RB", "LB, LWB", "RB, RWB", "RWB, RB",
+    "DMF", "LDMF, RDMF", "LCMF, DMF", "RCMF, LCMF", "RCMF, RDMF, DMF", "AMF", "AMF, CF",
+    "RAMF, AMF", "LAMF, LWF", "LWF, RWF", "RWF, RAMF, RW", "LWF, LAMF, CF, AMF", "CF",
+)
+
+# Non-template metrics so the width matches a real export (~115 columns)
+FILLER_METRICS = 70
+
+
+def synthetic_frame(rows, seed=0):
+    """A Wyscout-shaped frame of ``rows`` players with every template column."""
+    from .templates import TEMPLATES
+
+    rng = np.random.default_rng(seed)
+    teams = [f"Team {i}" for i in range(max(20, rows // 25))]
+    metrics = sorted({column for template in TEMPLATES.values() for column in template.columns})
+    frame = pd.DataFrame({
+        "Player": [f"{chr(65 + i % 26)}. Player{i}" for i in range(rows)],
+        "Team": rng.choice(teams, rows),
+        "Team within selected timeframe": rng.choice(teams, rows),
+        "Position": rng.choice(POSITION_STRINGS, rows),
+        "Age": rng.integers(16, 38, rows),
+        "Market value": rng.integers(0, 10 ** 8, rows),
+        "Contract expires": rng.choice(["2025-06-30", "2026-06-30", "2027-06-30"], rows),
+        "Matches played": rng.integers(0, 39, rows),
+        "Minutes played": rng.integers(0, 3420, rows),
+        "Birth country": rng.choice(["England", "Spain", "France", "Brazil", "Germany"], rows),
+        "Passport country": rng.choice(["England", "Spain", "France"], rows),
+        "Foot": rng.choice(["right", "left", "both"], rows),
+        "Height": rng.integers(160, 202, rows),
+        "Weight": rng.integers(58, 98, rows),
+        "On loan": rng.choice(["yes", "no"], rows),
+    })
+    values = {}
+    for column in metrics:
+        scale = 100 if column.endswith("%") else 5
+        values[column] = np.round(rng.random(rows) * scale, 2)
+    for i in range(FILLER_METRICS):
+        values[f"Metric {i} per 90"] = np.round(rng.random(rows) * 10, 2)
+    return pd.concat([frame, pd.DataFrame(values)], axis=1)
+
+
+def synthetic_workbook(rows, seed=0):
+    """The bytes of an .xlsx holding :func:`synthetic_frame`."""
+    buf = io.BytesIO()
+    synthetic_frame(rows, seed).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def measure(fn, repeat=3, setup=None):
+    """``{min, median, mean, repeat}`` seconds of ``fn()`` over ``repeat`` runs.
+
+    ``setup()`` runs untimed before each call.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return dict(min=min(times), median=statistics.median(times),
+                mean=statistics.fmean(times), repeat=repeat)
+
+
+def _stages(rows, repeat, seed, position):
+    from .api import (
+        PNG_DPI, build_pizza, build_radar, build_raw_pizza, chart_cache, render_chart,
+    )
+    from .charts import figure_bytes
+    from .dataset import Dataset
+    from .dtypes import compact_frame
+    from .percentiles import percentile_ranks
+    from .positions import build_player_positions, build_position_index, split_positions
+    from .templates import TEMPLATES
+
+    raw = synthetic_workbook(rows, seed)
+    yield "read_excel", measure(lambda: pd.read_excel(io.BytesIO(raw)), repeat)
+
+    frame = pd.read_excel(io.BytesIO(raw))
+    yield "split_positions", measure(lambda: split_positions(frame), repeat)
+    positions = compact_frame(split_positions(frame))
+    yield "position_index", measure(lambda: build_position_index(positions), repeat)
+    yield "player_positions", measure(
+        lambda: build_player_positions(frame["Player"], positions), repeat)
+
+    dataset = Dataset(f"bench-{rows}-{seed}", compact_frame(frame), positions, source="frame")
+    names = dataset.frame["Player"].iloc[:1000].tolist()
+    # per lookup, once the maps are built
+    for attr in ("player_positions", "key_rows", "name_rows"):
+        getattr(dataset, attr)
+    lookups = measure(lambda: [dataset.positions_for_player(name) for name in names], repeat)
+    yield "positions_for_player", {k: v / len(names) if k != "repeat" else v
+                                   for k, v in lookups.items()}
+
+    cols = list(TEMPLATES[position].columns)
+    cohort = dataset.frame.iloc[dataset.cohort_rows(position, 0)][cols].to_numpy(dtype=float)
+    yield "percentile_ranks", measure(lambda: percentile_ranks(cohort), repeat)
+
+    player = dataset.frame["Player"].iloc[dataset.cohort_rows(position, 0)[0]]
+    images = dict(brand=None, logo=None)
+    figures = {
+        "pizza": lambda: build_pizza(dataset, player, position, "League", "2024/25", **images),
+        "radar": lambda: build_radar(dataset, player, position, "League", "2024/25", **images),
+        "raw_pizza": lambda: build_raw_pizza(dataset, player, position, "League", "2024/25",
+                                             **images),
+    }
+    for chart, figure in figures.items():
+        # a full draw and savefig, at the app's dpi
+        build = lambda figure=figure: figure_bytes(figure(), dpi=PNG_DPI)
+        build()  # ranks, ranges and fonts are memoised; time the drawing
+        yield f"render.{chart}", measure(build, repeat)
+        # a cached base with the player layer blitted on; the PNG cache is cleared first
+        blit = lambda chart=chart: render_chart(dataset, chart, player, position, "League",
+                                                "2024/25", **images)
+        blit()
+        yield f"render.{chart}.blit", measure(blit, repeat, setup=chart_cache.clear)
+
+
+def run(sizes=DEFAULT_SIZES, repeat=3, seed=0, position="CM", progress=None):
+    """Benchmark every stage at each size; returns the JSON-ready report."""
+    os.environ["WTA_FONT_DOWNLOAD"] = "0"
+    import matplotlib
+    matplotlib.use("Agg")
+
+    results = []
+    for rows in sizes:
+        for stage, timing in _stages(rows, repeat, seed, position):
+            record = dict(rows=rows, stage=stage, **timing)
+            results.append(record)
+            if progress is not None:
+                progress(record)
+    return dict(
+        created=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        machine=dict(python=platform.python_version(), platform=platform.platform(),
+                     cpus=os.cpu_count()),
+        versions={name: _version(name) for name in ("pandas", "numpy", "matplotlib",
+                                                    "mplsoccer", "openpyxl", "scipy")},
+        params=dict(sizes=list(sizes), repeat=repeat, seed=seed, position=position),
+        results=results,
+    )
+
+
+def _version(name):
+    try:
+        return __import__(name).__version__
+    except (ImportError, AttributeError):
+        return None
+
+
+def write_report(report, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+        fh.write("\n")
@@ -0,0 +1,115 @@
+"""Small thread-safe LRU cache used by the ingestion and chart layers."""
+import os
+import threading
+from collections import OrderedDict
+
+
+def cache_root():
+    """Root directory for on-disk caches, or ``None`` when disabled.
+
+    Defaults to ``~/.cache/wtanalysis``; set ``WTA_CACHE_DIR`` to move it,
+    or to an empty string to turn disk caching off.
+    """
+    path = os.environ.get("WTA_CACHE_DIR")
+    if path is None:
+        path = os.path.join(os.path.expanduser("~"), ".cache", "wtanalysis")
+    return path or None
+
+
+# Named caches by name, for monitoring (see :func:`cache_stats`)
+CACHES = {}
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    Streamlit reruns the whole script on every widget change, but imported
+    modules survive between reruns, so an instance kept at module level acts
+    as a per-process cache shared by every session on the worker. Giving it
+    a ``name`` registers it in :data:`CACHES`.
+    """
+
+    def __init__(self, maxsize=8, maxbytes=None, sizeof=len, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        # Optional byte budget, for caches of encoded images and the like;
+        # ``sizeof`` gives each value's size.
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name is not None:
+            CACHES[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            if self.maxbytes is not None:
+                if key in self._data:
+                    self.nbytes -= self.sizeof(self._data[key])
+                self.nbytes += self.sizeof(value)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes
+                    and len(self._data) > 1):
+                _, evicted = self._data.popitem(last=False)
+                if self.maxbytes is not None:
+                    self.nbytes -= self.sizeof(evicted)
+
+    def get_or_create(self, key, factory):
+        """Return ``(value, hit)``, building the value with ``factory()`` on a miss.
+
+        The factory runs outside the lock so one slow build (an Excel parse,
+        a figure render) doesn't block lookups for other keys.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value, True
+        value = factory()
+        self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def cache_stats():
+    """``{name: stats}`` for every named cache."""
+    return {name: cache.stats() for name, cache in sorted(CACHES.items())}
@@ -0,0 +1,434 @@
+"""Figure construction for the Pizza, Radar, comparison Radar and Raw Pizza charts.
+
+These build a matplotlib figure from already-prepared values; picking the
+cohort and ranking happen in the caller. Fonts come from
+:func:`wtanalysis.assets.load_fonts`, so each process loads them once.
+"""
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+from mplsoccer import PyPizza, Radar, add_image
+
+from .assets import load_fonts
+# data-only helper, kept importable from here for chart callers
+from .percentiles import metric_ranges
+
+# (slice, value-text) colors per template category
+CATEGORY_COLORS = {
+    "attacking": ("#ea5a00", "#000000"),
+    "possession": ("#004E89", "#000000"),
+    "defending": ("#630101", "#F2F2F2"),
+}
+DEFAULT_CATEGORIES = ("attacking",) * 5 + ("possession",) * 5 + ("defending",) * 5
+
+
+def category_colors(categories=None):
+    """``(slice colors, text colors)`` for a template's per-metric categories."""
+    categories = categories or DEFAULT_CATEGORIES
+    return ([CATEGORY_COLORS[c][0] for c in categories],
+            [CATEGORY_COLORS[c][1] for c in categories])
+
+
+def _category_legend(fig, font_bold):
+    fig.text(
+        0.34, 0.925, "Attacking        Possession       Defending", size=14,
+        fontproperties=font_bold.prop, color="#000000"
+    )
+    fig.patches.extend([
+        plt.Rectangle((0.31, 0.9225), 0.025, 0.021, fill=True, color="#ea5a00",
+                      transform=fig.transFigure, figure=fig),
+        plt.Rectangle((0.462, 0.9225), 0.025, 0.021, fill=True, color="#004E89",
+                      transform=fig.transFigure, figure=fig),
+        plt.Rectangle((0.632, 0.9225), 0.025, 0.021, fill=True, color="#630101",
+                      transform=fig.transFigure, figure=fig),
+    ])
+
+
+def _pizza_scale(values, low, high):
+    # PyPizza's own range scaling, so a moved slice lands where a fresh one would
+    low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+    clipped = np.minimum(np.maximum(values, np.minimum(low, high)), np.maximum(low, high))
+    return np.abs(clipped - low) / np.abs(high - low) * 100
+
+
+def _pizza_update(ax, baker, heights, values):
+    slices = ax.containers[0]
+    for bar, text, height, value in zip(slices, baker.get_value_texts(), heights, values):
+        bar.set_height(height)
+        text.set_y(height)
+        text.set_text(value)
+
+
+def pizza_layers(params, position, league, season, min_minutes, brand=None, logo=None,
+                 categories=None, reference_label=None):
+    """Percentile Pizza without a player: ``(fig, layer, update)``.
+
+    ``layer`` is the player-specific artists in draw order and
+    ``update(values, player, team)`` points them at one player. Slices are
+    colored by ``categories`` (one per param; default five of each).
+    ``reference_label`` names the population the percentiles are against
+    when it isn't ``league`` (a pooled, multi-league reference).
+    """
+    font_normal, font_italic, font_bold = load_fonts()
+    slice_colors, text_colors = category_colors(categories)
+    values = [0] * len(params)
+
+    # instantiate PyPizza class
+    baker = PyPizza(
+        params=params,                  # list of parameters
+        background_color="#F2F2F2",     # background color
+        straight_line_color="#F2F2F2",  # color for straight lines
+        straight_line_lw=1,             # linewidth for straight lines
+        last_circle_lw=0,               # linewidth of last circle
+        other_circle_lw=0,              # linewidth for other circles
+        inner_circle_size=20            # size of inner circle
+    )
+
+    # plot pizza
+    fig, ax = baker.make_pizza(
+        values,                          # list of values
+        figsize=(8, 8.5),                # adjust figsize according to your need
+        color_blank_space="same",        # use same color to fill blank space
+        slice_colors=slice_colors,       # color for individual slices
+        value_colors=text_colors,        # color for the value-text
+        value_bck_colors=slice_colors,   # color for the blank spaces
+        blank_alpha=0.4,                 # alpha for blank-space colors
+        kwargs_slices=dict(
+            edgecolor="#F2F2F2", zorder=2, linewidth=1
+        ),                               # values to be used when plotting slices
+        kwargs_params=dict(
+            color="#000000", fontsize=11,
+            fontproperties=font_normal.prop, va="center"
+        ),                               # values to be used when adding parameter
+        kwargs_values=dict(
+            color="#000000", fontsize=11,
+            fontproperties=font_normal.prop, zorder=3,
+            bbox=dict(
+                edgecolor="#000000", facecolor="cornflowerblue",
+                boxstyle="round,pad=0.2", lw=1
+            )
+        )                                # values to be used when adding parameter-values
+    )
+
+    # add title
+    title = fig.text(
+        0.515, 0.975, "", size=16,
+        ha="center", fontproperties=font_bold.prop, color="#000000"
+    )
+
+    # add subtitle
+    fig.text(
+        0.515, 0.953,
+        f'Compared against other {position} in {reference_label or league} | Season {season}',
+        size=13,
+        ha="center", fontproperties=font_bold.prop, color="#000000"
+    )
+
+    # add credits
+    credit = f"Data from Wyscout | Metrics are per 90 unless stated | Minimum {min_minutes} mins played"
+    fig.text(
+        0.99, 0.02, credit, size=9,
+        fontproperties=font_italic.prop, color="#000000",
+        ha="right"
+    )
+
+    _category_legend(fig, font_bold)
+
+    # add images (these values might differ when you are plotting)
+    if brand is not None:
+        add_image(brand, fig, left=0.87, bottom=0.85, width=0.15, height=0.15)
+    if logo is not None:
+        add_image(logo, fig, left=0.05, bottom=0.01, width=0.125, height=0.125)
+
+    def update(values, player, team):
+        _pizza_update(ax, baker, values, values)
+        title.set_text(f'{player} - {team} - Percentile Rank (0-100)')
+
+    return fig, [*ax.containers[0], *baker.get_value_texts(), title], update
+
+
+def pizza_figure(params, values, player, team, position, league, season, min_minutes,
+                 brand=None, logo=None, categories=None, reference_label=None):
+    """Percentile Pizza: ``values`` are 0-100 percentile ranks, one per param."""
+    fig, _, update = pizza_layers(params, position, league, season, min_minutes,
+                                  brand=brand, logo=logo, categories=categories,
+                                  reference_label=reference_label)
+    update(values, player, team)
+    return fig
+
+
+def radar_layers(params, low, high, average_vals, position, league, season,
+                 brand=None, logo=None, min_minutes=None):
+    """Radar without a player: ``(fig, layer, update)``, see :func:`pizza_layers`.
+
+    ``min_minutes`` is the threshold the ranges and average were taken at,
+    for the credits; ``None`` means every player at the position.
+
+    The average polygon, spokes and labels are drawn over the player polygon,
+    so they belong to the layer too; only the rings, legend and credits don't.
+    """
+    font_normal, font_italic, font_bold = load_fonts()
+
+    radar = Radar(
+        params=params,
+        min_range=low,
+        max_range=high,
+        round_int=[False] * len(params),
+        num_rings=4,
+        ring_width=1,
+        center_circle_radius=1,
+    )
+
+    fig, ax = radar.setup_axis()
+    fig.patch.set_facecolor('#F2F2F2')   # <--- full figure background
+    ax.set_facecolor('#F2F2F2')
+    radar.draw_circles(ax=ax, facecolor='#b3b3b3', edgecolor='#b3b3b3')
+
+    # player vs league avg
+    player_poly, average_poly, _, _ = radar.draw_radar_compare(
+        average_vals, average_vals, ax=ax,
+        kwargs_radar={'facecolor': '#ea5a00', 'alpha': 1},
+        kwargs_compare={'facecolor': '#004E89', 'alpha': 0.4}
+    )
+    range_labels = radar.draw_range_labels(ax=ax, fontsize=10, fontproperties=font_italic.prop)
+    param_labels = radar.draw_param_labels(ax=ax, fontsize=12.5, fontproperties=font_bold.prop,
+                                           color='black')
+    spokes = radar.spoke(ax=ax, color='#a6a4a1', linestyle='--', zorder=2)
+
+    # Title
+    ax_limits = ax.get_xlim(), ax.get_ylim()
+    cx = (ax_limits[0][0] + ax_limits[0][1]) / 2
+    title = ax.text(
+        cx, 6.65, "",
+        size=17, fontproperties=font_bold.prop, color="#000000",
+        ha="center", bbox=dict(facecolor='#f2f2f2', alpha=0.5, edgecolor='#f2f2f2')
+    )
+
+    # Logos (safe if not provided)
+    if brand is not None:
+        add_image(brand, fig, left=0.775, bottom=0.725, width=0.15, height=0.15)
+    if logo is not None:
+        add_image(logo, fig, left=0.135, bottom=0.115, width=0.125, height=0.125)
+
+    # Legend chips + captions
+    name = fig.text(0.17, 0.8525, "", size=10, fontproperties=font_bold.prop, color="#000000")
+    fig.text(0.17, 0.8275, "League Average", size=10, fontproperties=font_bold.prop, color="#000000")
+    minutes = "All minutes" if min_minutes is None else f"Minimum {min_minutes} minutes"
+    fig.text(0.67, 0.12, f"Data from Wyscout | {minutes} played", size=8,
+             fontproperties=font_bold.prop, color="#000000")
+    fig.patches.extend([
+        plt.Rectangle((0.15, 0.85), 0.015, 0.015, fill=True, color="#ea5a00",
+                      transform=fig.transFigure, figure=fig),
+        plt.Rectangle((0.15, 0.825), 0.015, 0.015, fill=True, color="#004E89",
+                      transform=fig.transFigure, figure=fig),
+    ])
+
+    def update(player_vals, player):
+        # let mplsoccer scale the values, then move the existing polygon there
+        scratch, vertices = radar.draw_radar_solid(player_vals, ax=ax)
+        scratch.remove()
+        player_poly.set_xy(vertices)
+        title.set_text(f"{player} compared to {league} ({position}) average in {season}")
+        name.set_text(f"{player}")
+
+    # the logos are drawn over the radar axes, so they are redrawn with it
+    images = fig.axes[1:]
+    layer = [player_poly, average_poly, *spokes, *range_labels, *param_labels, title,
+             *images, name]
+    return fig, layer, update
+
+
+def radar_figure(params, low, high, player_vals, average_vals, player, position, league, season,
+                 brand=None, logo=None, min_minutes=None):
+    """Radar of ``player_vals`` against the cohort ``average_vals`` on ``low``-``high`` ranges."""
+    fig, _, update = radar_layers(params, low, high, average_vals, position, league, season,
+                                  brand=brand, logo=logo, min_minutes=min_minutes)
+    update(player_vals, player)
+    return fig
+
+
+# Player colors on a comparison radar, in selection order
+COMPARE_COLORS = ("#ea5a00", "#004E89", "#630101", "#2a9d8f")
+
+
+def compare_radar_layers(params, low, high, average_vals, position, league, season, min_minutes,
+                         brand=None, logo=None):
+    """Radar for up to four players over the cohort average: ``(fig, layer, update)``.
+
+    ``update(players)`` takes ``[(name, values), ...]``; slots past the
+    last player are hidden, so one base serves any comparison of the
+    cohort. The cohort average is a dashed outline over the players; as in
+    :func:`radar_layers`, whatever is drawn over the polygons is in the layer.
+    """
+    font_normal, font_italic, font_bold = load_fonts()
+
+    radar = Radar(
+        params=params,
+        min_range=low,
+        max_range=high,
+        round_int=[False] * len(params),
+        num_rings=4,
+        ring_width=1,
+        center_circle_radius=1,
+    )
+
+    fig, ax = radar.setup_axis()
+    fig.patch.set_facecolor('#F2F2F2')
+    ax.set_facecolor('#F2F2F2')
+    radar.draw_circles(ax=ax, facecolor='#b3b3b3', edgecolor='#b3b3b3')
+    polygons = [
+        radar.draw_radar_solid(average_vals, ax=ax, kwargs={
+            'facecolor': color, 'edgecolor': color, 'alpha': 0.45, 'linewidth': 2,
+        })[0]
+        for color in COMPARE_COLORS
+    ]
+    average_poly, _ = radar.draw_radar_solid(average_vals, ax=ax, kwargs={
+        'facecolor': 'none', 'edgecolor': '#000000', 'linestyle': '--', 'linewidth': 1.5,
+    })
+    range_labels = radar.draw_range_labels(ax=ax, fontsize=10, fontproperties=font_italic.prop)
+    param_labels = radar.draw_param_labels(ax=ax, fontsize=12.5, fontproperties=font_bold.prop,
+                                           color='black')
+    spokes = radar.spoke(ax=ax, color='#a6a4a1', linestyle='--', zorder=2)
+
+    ax_limits = ax.get_xlim(), ax.get_ylim()
+    cx = (ax_limits[0][0] + ax_limits[0][1]) / 2
+    ax.text(
+        cx, 6.65, f"{league} ({position}) comparison in {season}",
+        size=17, fontproperties=font_bold.prop, color="#000000",
+        ha="center", bbox=dict(facecolor='#f2f2f2', alpha=0.5, edgecolor='#f2f2f2')
+    )
+
+    if brand is not None:
+        add_image(brand, fig, left=0.775, bottom=0.725, width=0.15, height=0.15)
+    if logo is not None:
+        add_image(logo, fig, left=0.135, bottom=0.115, width=0.125, height=0.125)
+
+    # Legend: the average's dashed line, then one chip + name per player slot
+    fig.lines.append(plt.Line2D([0.05, 0.065], [0.9075, 0.9075], color="#000000", linestyle="--",
+                                linewidth=1.5, transform=fig.transFigure, figure=fig))
+    fig.text(0.07, 0.9025, "League Average", size=10, fontproperties=font_bold.prop,
+             color="#000000")
+    names, chips = [], []
+    for i, color in enumerate(COMPARE_COLORS):
+        y = 0.875 - 0.025 * i
+        chips.append(plt.Rectangle((0.05, y), 0.015, 0.015, fill=True, color=color,
+                                   transform=fig.transFigure, figure=fig))
+        names.append(fig.text(0.07, y + 0.0025, "", size=10, fontproperties=font_bold.prop,
+                              color="#000000"))
+    fig.patches.extend(chips)
+    fig.text(0.67, 0.12, f"Data from Wyscout | Minimum {min_minutes} minutes played", size=8,
+             fontproperties=font_bold.prop, color="#000000")
+
+    def update(players):
+        if not 1 <= len(players) <= len(COMPARE_COLORS):
+            raise ValueError(f"Compare 1-{len(COMPARE_COLORS)} players, got {len(players)}")
+        for i, (poly, chip, name) in enumerate(zip(polygons, chips, names)):
+            shown = i < len(players)
+            for artist in (poly, chip, name):
+                artist.set_visible(shown)
+            if shown:
+                player, values = players[i]
+                scratch, vertices = radar.draw_radar_solid(values, ax=ax)
+                scratch.remove()
+                poly.set_xy(vertices)
+                name.set_text(player)
+
+    # the logos are drawn over the radar axes, so they are redrawn with it
+    images = fig.axes[1:]
+    layer = [*polygons, average_poly, *spokes, *range_labels, *param_labels, *chips, *names,
+             *images]
+    return fig, layer, update
+
+
+def compare_radar_figure(params, low, high, players, average_vals, position, league, season,
+                         min_minutes, brand=None, logo=None):
+    """Radar of ``players`` (``[(name, values), ...]``) over the cohort average."""
+    fig, _, update = compare_radar_layers(params, low, high, average_vals, position, league,
+                                          season, min_minutes, brand=brand, logo=logo)
+    update(players)
+    return fig
+
+
+def raw_pizza_layers(params, low, high, position, league, season, min_minutes,
+                     brand=None, logo=None, categories=None):
+    """Raw Pizza without a player: ``(fig, layer, update)``, see :func:`pizza_layers`."""
+    font_normal, font_italic, font_bold = load_fonts()
+    slice_colors, text_colors = category_colors(categories)
+    values = list(low)
+
+    baker = PyPizza(
+        params=params,
+        min_range=low,
+        max_range=high,
+        background_color="#F2F2F2",
+        straight_line_color="#F2F2F2",
+        last_circle_color="#000000", last_circle_lw=2.5,
+        straight_line_lw=1,
+        other_circle_lw=0, other_circle_color="#000000",
+        inner_circle_size=20,
+    )
+
+    fig, ax = baker.make_pizza(
+        values,
+        figsize=(8, 8),
+        color_blank_space="same",
+        slice_colors=slice_colors,
+        value_colors=text_colors,
+        value_bck_colors=slice_colors,
+        blank_alpha=0.4,
+        param_location=110,
+        kwargs_slices=dict(edgecolor="#F2F2F2", linewidth=1),
+        kwargs_params=dict(color="#000000", fontsize=11, fontproperties=font_normal.prop, va="center"),
+        kwargs_values=dict(
+            color="#000000", fontsize=11, fontproperties=font_normal.prop, zorder=3,
+            bbox=dict(edgecolor="#000000", facecolor="cornflowerblue", boxstyle="round,pad=0.2", lw=1),
+        ),
+    )
+
+    # Title / credits / legend
+    title = fig.text(
+        0.515, 0.975, "",
+        size=16, ha="center", fontproperties=font_bold.prop, color="#000000"
+    )
+    fig.text(
+        0.515, 0.953, f'{league} | Season {season} | > {min_minutes} mins | Compared with other {position}',
+        size=12, ha="center", fontproperties=font_bold.prop, color="#000000"
+    )
+
+    credit = "Data from Wyscout | Metrics are per 90 unless stated | Raw metrics"
+    fig.text(0.99, 0.02, credit, size=9, fontproperties=font_italic.prop, color="#000000", ha="right")
+
+    _category_legend(fig, font_bold)
+
+    if brand is not None:
+        add_image(brand, fig, left=0.87, bottom=0.85, width=0.15, height=0.15)
+    if logo is not None:
+        add_image(logo, fig, left=0.05, bottom=0.01, width=0.125, height=0.125)
+
+    def update(values, player, team):
+        _pizza_update(ax, baker, _pizza_scale(values, low, high), values)
+        title.set_text(f'{player} - {team}')
+
+    return fig, [*ax.containers[0], *baker.get_value_texts(), title], update
+
+
+def raw_pizza_figure(params, low, high, values, player, team, position, league, season, min_minutes,
+                     brand=None, logo=None, categories=None):
+    """Pizza of raw metric ``values`` scaled to the cohort's ``low``-``high`` ranges."""
+    fig, _, update = raw_pizza_layers(params, low, high, position, league, season, min_minutes,
+                                      brand=brand, logo=logo, categories=categories)
+    update(values, player, team)
+    return fig
+
+
+def figure_bytes(fig, fmt="png", dpi=None, close=True):
+    """Render ``fig`` to PNG/PDF bytes (tight bbox, like ``st.pyplot``), closing it by default."""
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight",
+                    facecolor=fig.get_facecolor())
+    finally:
+        if close:
+            plt.close(fig)
+    return buf.getvalue()
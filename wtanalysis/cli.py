@@ -0,0 +1,124 @@
+"""Command-line entry point: ``python -m wtanalysis``.
+
+Examples::
+
+    python -m wtanalysis chart prem.xlsx --player "C. Hudson-Odoi" --position LW \
+        --league "Premier League" --season 2024/25 --min-minutes 900 --out charts/
+    python -m wtanalysis batch prem.xlsx --position CM --min-minutes 900 \
+        --league "Premier League" --season 2024/25 --out cm.zip
+    python -m wtanalysis bench --sizes 1000 10000 --out bench.json
+"""
+import argparse
+import os
+import re
+import sys
+
+import matplotlib
+
+CHARTS = ("pizza", "radar", "raw_pizza")
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="wtanalysis", description="WT Analysis chart generator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("workbook", help="Wyscout export (.xlsx or .csv)")
+        p.add_argument("--position", required=True, help="e.g. CM, LW, CB")
+        p.add_argument("--league", default="", help="league name, for the subtitle and logo")
+        p.add_argument("--season", default="", help="season label, e.g. 2024/25")
+        p.add_argument("--min-minutes", type=int, default=0, help="minimum minutes played")
+        p.add_argument("--combine-splits", action="store_true",
+                       help="merge a transferred player's club splits into one season line "
+                            "(totals summed, rates weighted by minutes) before ranking")
+        p.add_argument("--stream", action="store_true",
+                       help="read in chunks, keeping only template columns and the rows that "
+                            "pass --position/--min-minutes (for very large exports or .csv)")
+
+    chart = sub.add_parser("chart", help="charts for one player")
+    common(chart)
+    chart.add_argument("--player", required=True)
+    chart.add_argument("--chart", choices=CHARTS + ("all",), default="all")
+    chart.add_argument("--format", choices=("png", "pdf"), default="png")
+    chart.add_argument("--out", default=".", help="output directory")
+
+    batch = sub.add_parser("batch", help="charts for every player in the cohort, zipped")
+    common(batch)
+    batch.add_argument("--charts", nargs="+", choices=CHARTS, default=list(CHARTS))
+    batch.add_argument("--formats", nargs="+", choices=("png", "pdf"), default=["png"])
+    batch.add_argument("--workers", type=int, default=None, help="render processes (default: CPUs)")
+    batch.add_argument("--out", required=True, help="zip file to write")
+
+    bench = sub.add_parser("bench", help="time each pipeline stage on synthetic workbooks")
+    bench.add_argument("--sizes", nargs="+", type=int, default=None,
+                       help="workbook rows (default: 1000 10000 50000)")
+    bench.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--position", default="CM", help="cohort to rank and chart")
+    bench.add_argument("--out", default="benchmark.json", help="JSON report to write")
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    matplotlib.use("Agg")
+
+    if args.command == "bench":
+        from .benchmark import DEFAULT_SIZES, run, write_report
+
+        def progress(record):
+            print(f"{record['rows']:>7} {record['stage']:<28} {record['median'] * 1000:10.2f} ms")
+
+        report = run(args.sizes or DEFAULT_SIZES, repeat=args.repeat, seed=args.seed,
+                     position=args.position, progress=progress)
+        write_report(report, args.out)
+        print(f"wrote {args.out}")
+        return 0
+
+    from .api import ChartError, build_pizza, build_radar, build_raw_pizza
+    from .batch import export_batch
+    from .ingest import load_path
+    from .stream import stream_workbook
+
+    if args.stream or args.workbook.lower().endswith(".csv"):
+        dataset = stream_workbook(args.workbook, min_minutes=args.min_minutes,
+                                  positions=[args.position])
+    else:
+        dataset = load_path(args.workbook)
+    if args.combine_splits:
+        dataset = dataset.combined
+
+    if args.command == "batch":
+        try:
+            n = export_batch(dataset, args.position, args.min_minutes, args.league, args.season,
+                             args.out, charts=args.charts, formats=args.formats,
+                             workers=args.workers)
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            return 1
+        print(f"wrote {n} files to {args.out}")
+        return 0
+
+    builders = {
+        "pizza": lambda: build_pizza(dataset, args.player, args.position, args.league, args.season,
+                                     args.min_minutes, fmt=args.format),
+        "radar": lambda: build_radar(dataset, args.player, args.position, args.league, args.season,
+                                     fmt=args.format),
+        "raw_pizza": lambda: build_raw_pizza(dataset, args.player, args.position, args.league,
+                                             args.season, args.min_minutes, fmt=args.format),
+    }
+    os.makedirs(args.out, exist_ok=True)
+    stem = re.sub(r"[^0-9A-Za-z]+", "_", args.player).strip("_")
+    status = 0
+    for name in CHARTS if args.chart == "all" else (args.chart,):
+        try:
+            data = builders[name]()
+        except ChartError as exc:
+            print(f"{name}: {exc}", file=sys.stderr)
+            status = 1
+            continue
+        path = os.path.join(args.out, f"{stem}_{args.position}_{name}.{args.format}")
+        with open(path, "wb") as fh:
+            fh.write(data)
+        print(path)
+    return status
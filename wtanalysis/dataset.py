@@ -0,0 +1,212 @@
+"""The parsed, shared representation of one uploaded Wyscout export."""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .positions import build_player_positions, build_position_index
+from .templates import resolve_templates
+from .timing import stage
+
+# Tag columns added to merged multi-league datasets (see wtanalysis.store)
+LEAGUE_COLUMN = "League"
+SEASON_COLUMN = "Season"
+
+
+class Dataset:
+    """One parsed Wyscout export, shared read-only by every tab.
+
+    ``frame`` is the DataFrame as parsed from the workbook, compacted to
+    float32 metrics and categorical text columns, and ``positions`` holds its
+    normalised position1..4 columns (same index).
+    Both are held in a process-wide cache and handed to every session that
+    uploads the same file, so callers must never modify them in place - slice
+    rows or columns and build a new frame before assigning columns.
+
+    ``source`` records where the data came from on first load: ``"excel"``
+    for a fresh openpyxl parse, ``"disk"`` for the columnar cache,
+    ``"frame"`` for a DataFrame passed in directly, ``"merge"`` for
+    several exports tagged with ``League``/``Season`` columns or
+    ``"stream"`` for a filtered, chunked import (:mod:`wtanalysis.stream`).
+    """
+
+    def __init__(self, key, frame, positions, parse_seconds=0.0, source="excel"):
+        self.key = key
+        self.frame = frame
+        self.positions = positions
+        self.parse_seconds = parse_seconds
+        self.source = source
+        self._views = LRUCache(maxsize=8)
+
+    @cached_property
+    def position_index(self):
+        """``{position: row numbers}``, built once per dataset."""
+        with stage("dataset.position_index"):
+            return build_position_index(self.positions)
+
+    def rows_for_position(self, position):
+        """Positional row numbers of every player who lists ``position``."""
+        return self.position_index.get(position, np.empty(0, dtype=np.intp))
+
+    def cohort_rows(self, position, min_minutes=0):
+        """Row numbers of ``position`` players with at least ``min_minutes`` played."""
+        rows = self.rows_for_position(position)
+        minutes = self.frame['Minutes played'].to_numpy()[rows]
+        return rows[minutes >= min_minutes]
+
+    @cached_property
+    def template_columns(self):
+        """``{position: (column indices, missing columns)}`` for every template, resolved once."""
+        return resolve_templates(self.frame.columns)
+
+    @cached_property
+    def missing_template_columns(self):
+        """``{position: missing columns}`` for templates this export can't fill."""
+        return {position: missing
+                for position, (_, missing) in self.template_columns.items() if missing}
+
+    @cached_property
+    def player_positions(self):
+        """``{player key: [positions in menu order]}``, built once per dataset."""
+        with stage("dataset.player_positions"):
+            return build_player_positions(pd.Series(self.player_keys), self.positions)
+
+    @cached_property
+    def player_keys(self):
+        """Stable player key of every row (see :mod:`wtanalysis.players`)."""
+        from .players import player_keys
+
+        with stage("dataset.player_keys"):
+            return player_keys(self.frame)
+
+    @cached_property
+    def key_rows(self):
+        """``{player key: row numbers}`` - a player's transfer splits share a key."""
+        from .players import key_index
+
+        return key_index(self.player_keys)
+
+    @cached_property
+    def name_rows(self):
+        """``{player name: row numbers}``, for lookups by name."""
+        from .players import key_index
+
+        return key_index(self.frame['Player'].astype(object).to_numpy())
+
+    @cached_property
+    def combined(self):
+        """This dataset with each player's transfer splits merged into one season line.
+
+        Built once (:func:`~wtanalysis.players.combine_frame`, one groupby)
+        and kept with the dataset, so every cohort, percentile and chart on
+        it counts a transferred player once. Positions are the main split's.
+        Returns the dataset itself when no player has splits.
+        """
+        from .players import combine_frame
+
+        with stage("dataset.combine_splits"):
+            frame, rows = combine_frame(self.frame, self.player_keys)
+        if len(rows) == len(self.frame):
+            return self
+        return Dataset(f"{self.key}/combined", frame, self.positions.iloc[rows],
+                       parse_seconds=self.parse_seconds, source=self.source)
+
+    def player_rows(self, player, rows=None):
+        """Row numbers of ``player``: a player key, or a name.
+
+        A name shared by several players means the first of them (in file
+        order). With ``rows`` (sorted row numbers, e.g. a cohort) only rows
+        among those count, so a name resolves to the first such player who
+        is in it. Two hash lookups, no column scans.
+        """
+        found = self.key_rows.get(player)
+        by_name = found is None
+        if by_name:
+            found = self.name_rows.get(player, np.empty(0, dtype=np.intp))
+        if rows is not None:
+            found = _among(found, rows)
+        if by_name and len(found):
+            found = self.player_rows(self.player_keys[found[0]], rows)
+        return found
+
+    def player_name(self, player):
+        """Display name of ``player`` (a key or a name)."""
+        rows = self.player_rows(player)
+        return self.frame['Player'].iat[rows[0]] if len(rows) else player
+
+    @cached_property
+    def search_index(self):
+        """:class:`~wtanalysis.search.PlayerIndex` over names, teams and ages, one entry per player key."""
+        from .search import PlayerIndex
+
+        with stage("dataset.search_index"):
+            return PlayerIndex.from_frame(self.frame, self.player_keys)
+
+    def positions_for_player(self, player):
+        """Positions ``player`` (a key or a name) actually played (from position1..4)."""
+        rows = self.player_rows(player)
+        if not len(rows):
+            return []
+        return list(self.player_positions.get(self.player_keys[rows[0]], []))
+
+    @cached_property
+    def tag_rows(self):
+        """``{(league, season): row numbers}`` for a merged dataset; empty otherwise."""
+        if LEAGUE_COLUMN not in self.frame.columns:
+            return {}
+        groups = self.frame.groupby([LEAGUE_COLUMN, SEASON_COLUMN], observed=True, sort=True)
+        return {tags: rows.astype(np.intp) for tags, rows in groups.indices.items()}
+
+    @cached_property
+    def leagues(self):
+        """Leagues in a merged dataset, sorted."""
+        return sorted({league for league, _ in self.tag_rows})
+
+    def seasons(self, league=None):
+        """Seasons in a merged dataset, optionally just those of ``league``."""
+        return sorted({season for lg, season in self.tag_rows if not league or lg == league})
+
+    def select(self, league=None, season=None):
+        """The rows tagged ``league``/``season`` as a dataset of their own.
+
+        ``league`` may also be a list of leagues (a pooled reference
+        population). Empty tags match everything, and an untagged dataset
+        returns itself. Views are cached per dataset, so filtering a merged
+        store by league costs one row slice the first time and nothing after.
+        """
+        if not self.tag_rows or not (league or season):
+            return self
+        leagues = (league,) if isinstance(league, str) else tuple(sorted(league or ()))
+        leagues = tuple(lg for lg in leagues if lg)
+
+        def build():
+            parts = [rows for (lg, ss), rows in self.tag_rows.items()
+                     if (not leagues or lg in leagues) and (not season or ss == season)]
+            rows = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+            return Dataset(f"{self.key}/{'+'.join(leagues) or '*'}/{season or '*'}",
+                           self.frame.iloc[rows], self.positions.iloc[rows], source=self.source)
+
+        return self._views.get_or_create((leagues, season or ""), build)[0]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __repr__(self):
+        return f"Dataset(key={self.key[:12]!r}, rows={len(self.frame)}, source={self.source!r})"
+
+
+def _among(found, rows):
+    # the row numbers in ``found`` that are also in the sorted array ``rows``
+    if not len(rows):
+        return found[:0]
+    at = np.minimum(np.searchsorted(rows, found), len(rows) - 1)
+    return found[rows[at] == found]
+
+
+def team_name(row):
+    """Team for a player row, from ``Team`` or the timeframe team column."""
+    for col in ("Team", "Team within selected timeframe"):
+        if col in row.index and pd.notna(row[col]):
+            return row[col]
+    return ""
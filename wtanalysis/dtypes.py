@@ -0,0 +1,57 @@
+"""Compact dtypes for a parsed export: float32 metrics, categorical labels.
+
+A Wyscout export is mostly float64 metrics and strings that repeat on
+every row (teams, positions, feet, countries). The dataset converts once,
+at load, and every session and tab then works on slices of that one
+frame, which is roughly half the size of what ``read_excel`` returns.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api import types
+
+# Text columns that are always categorical when present
+CATEGORICAL_COLUMNS = (
+    "Team", "Team within selected timeframe", "Position", "Foot",
+    "Birth country", "Passport country", "On loan", "Contract expires",
+    "League", "Season",
+)
+
+# Text columns that stay plain strings: player names are matched and listed as-is
+TEXT_COLUMNS = ("Player",)
+
+# Player ID columns, kept exact (float32 can't hold every ID)
+ID_COLUMNS = ("Wyscout ID", "Player ID", "Wyscout id", "wyId")
+
+# Any other text column becomes categorical when at most this share of its values is unique
+MAX_UNIQUE_RATIO = 0.5
+
+
+def compact_dtypes(frame):
+    """``{column: dtype}`` for the columns of ``frame`` that can be stored more compactly."""
+    dtypes = {}
+    for name, col in frame.items():
+        if name in ID_COLUMNS:
+            continue
+        if types.is_float_dtype(col.dtype) and col.dtype != np.float32:
+            dtypes[name] = np.float32
+        elif types.is_integer_dtype(col.dtype) and col.dtype.itemsize > 4:
+            # int32, not narrower: minutes and counts get summed across rows
+            info = np.iinfo(np.int32)
+            if col.empty or (info.min <= col.min() and col.max() <= info.max):
+                dtypes[name] = np.int32
+        elif name in TEXT_COLUMNS or isinstance(col.dtype, pd.CategoricalDtype):
+            continue
+        elif types.is_object_dtype(col.dtype) or types.is_string_dtype(col.dtype):
+            if name in CATEGORICAL_COLUMNS or col.nunique() <= len(col) * MAX_UNIQUE_RATIO:
+                dtypes[name] = "category"
+    return dtypes
+
+
+def compact_frame(frame):
+    """``frame`` with float32 metrics, int32 integers and categorical text columns.
+
+    Returns ``frame`` itself when nothing can be narrowed, otherwise one new
+    frame; values other than float precision are unchanged.
+    """
+    dtypes = compact_dtypes(frame)
+    return frame.astype(dtypes) if dtypes else frame
@@ -0,0 +1,161 @@
+"""Parse uploaded Wyscout workbooks once per file content.
+
+Parsed workbooks are cached at two levels:
+
+* in memory, in a bounded per-process LRU (:data:`workbook_cache`);
+* on local disk, as an uncompressed Feather (Arrow IPC) file per content
+  hash, so a restarted or second Streamlit worker memory-maps the converted
+  export instead of going through openpyxl again.
+
+Frames are compacted once after parsing (float32 metrics, categorical
+teams/positions/countries, see :mod:`wtanalysis.dtypes`), and the Feather
+file keeps those dtypes.
+
+Set ``WTA_CACHE_DIR`` to choose where the Feather files live, or to an
+empty string to turn the disk cache off.
+"""
+import hashlib
+import io
+import logging
+import os
+import time
+
+import pandas as pd
+
+from .cache import LRUCache, cache_root
+from .dataset import Dataset
+from .dtypes import compact_frame
+from .positions import POSITION_COLUMNS, split_positions
+from .timing import stage
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = None
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# A 3,000 x 120 league export is a few MB as a DataFrame, so a handful of
+# recently used workbooks per worker is plenty.
+workbook_cache = LRUCache(maxsize=8, name="workbooks")
+
+# Bump when the stored layout, the column dtypes or the position normalisation
+# changes so stale files are ignored rather than trusted.
+DISK_FORMAT_VERSION = 4
+
+
+def content_hash(raw):
+    """Stable key for an uploaded file: the SHA-1 of its bytes."""
+    return hashlib.sha1(raw).hexdigest()
+
+
+def cache_dir():
+    """Directory for the on-disk columnar cache, or ``None`` when disabled."""
+    if feather is None:
+        return None
+    return cache_root()
+
+
+def _disk_path(key):
+    directory = cache_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, f"{key}.v{DISK_FORMAT_VERSION}.feather")
+
+
+def _read_disk(key):
+    path = _disk_path(key)
+    if path is None or not os.path.exists(path):
+        return None
+    start = time.perf_counter()
+    try:
+        with stage("disk.read"):
+            table = feather.read_table(path, memory_map=True)
+            combined = table.to_pandas()
+    except (OSError, pa.ArrowException) as exc:
+        logger.warning("Ignoring unreadable cache file %s: %s", path, exc)
+        return None
+    frame = combined.drop(columns=POSITION_COLUMNS)
+    positions = combined[POSITION_COLUMNS]
+    return Dataset(key, frame, positions,
+                   parse_seconds=time.perf_counter() - start, source="disk")
+
+
+def _write_disk(dataset):
+    path = _disk_path(dataset.key)
+    if path is None:
+        return
+    combined = pd.concat([dataset.frame, dataset.positions], axis=1)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Uncompressed so readers can memory-map the file without decoding
+        with stage("disk.write"):
+            feather.write_feather(combined, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except (OSError, pa.ArrowException, TypeError, ValueError) as exc:
+        # Mixed-type object columns can't always be converted to Arrow;
+        # the in-memory cache still works, so just skip the disk copy.
+        logger.warning("Could not write cache file %s: %s", path, exc)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _parse(key, raw):
+    start = time.perf_counter()
+    with stage("parse.read_excel"):
+        frame = pd.read_excel(io.BytesIO(raw))
+    with stage("parse.split_positions"):
+        positions = split_positions(frame)
+    with stage("parse.compact"):
+        positions = compact_frame(positions)
+        frame = compact_frame(frame)
+    return Dataset(key, frame, positions, parse_seconds=time.perf_counter() - start)
+
+
+def _load(key, raw):
+    dataset = _read_disk(key)
+    if dataset is None:
+        dataset = _parse(key, raw)
+        _write_disk(dataset)
+    return dataset
+
+
+def load_path(path):
+    """Load a workbook from ``path`` through the same caches as an upload."""
+    with open(path, "rb") as fh:
+        return load_workbook(fh.read())[0]
+
+
+def dataset_from_frame(frame):
+    """Wrap an already-loaded DataFrame (e.g. from a notebook) as a :class:`Dataset`.
+
+    The key is a hash of the frame's contents, so the same frame maps to the
+    same cached dataset and memoised percentiles. The dataset holds a compact
+    copy (:func:`~wtanalysis.dtypes.compact_frame`); ``frame`` isn't modified.
+    """
+    digest = hashlib.sha1(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    digest.update("\x1f".join(map(str, frame.columns)).encode())
+    key = digest.hexdigest()
+
+    def build():
+        positions = compact_frame(split_positions(frame))
+        return Dataset(key, compact_frame(frame), positions, source="frame")
+
+    return workbook_cache.get_or_create(key, build)[0]
+
+
+def load_workbook(raw):
+    """Return ``(dataset, from_cache)`` for the workbook bytes in ``raw``.
+
+    The workbook is parsed with ``pd.read_excel`` only the first time its
+    content is seen on this machine; later calls (reruns, other sessions,
+    other workers, re-uploads of the same file) get the cached
+    :class:`Dataset` back from memory or from the Feather file on disk.
+    ``from_cache`` is true only for in-memory hits; check
+    ``dataset.source`` to tell a disk load from a fresh parse.
+    """
+    key = content_hash(raw)
+    return workbook_cache.get_or_create(key, lambda: _load(key, raw))
@@ -0,0 +1,142 @@
+"""Chart bases: the static part of a chart drawn once, players blitted on top.
+
+For a given template the slice layout, labels, rings, legend, credits and
+logos of a chart don't depend on the player. A :class:`ChartBase` renders
+all of that once with Agg and keeps the pixels; each player then only
+restores that background, redraws the handful of player-specific artists
+and crops to the same tight bounding box ``savefig`` would use.
+"""
+import io
+import threading
+
+import matplotlib.image
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+import matplotlib.pyplot as plt
+
+from .cache import LRUCache
+from .charts import (
+    compare_radar_layers, figure_bytes, pizza_layers, radar_layers, raw_pizza_layers,
+)
+from .timing import stage
+
+BUILDERS = {
+    "pizza": pizza_layers,
+    "radar": radar_layers,
+    "raw_pizza": raw_pizza_layers,
+    "radar_compare": compare_radar_layers,
+}
+
+# savefig's default pad around a tight bbox, in inches
+PAD_INCHES = 0.1
+
+# A base holds its RGBA background: ~11 MB for a chart at dpi=200
+base_cache = LRUCache(maxsize=32, maxbytes=128 * 1024 * 1024, sizeof=lambda base: base.nbytes,
+                      name="chart_bases")
+
+
+class ChartBase:
+    """One chart's static artists, rasterised at ``dpi``, plus its player layer."""
+
+    def __init__(self, chart, dpi=None, **static):
+        with stage(f"chart.base.{chart}"):
+            fig, layer, update = BUILDERS[chart](**static)
+        # keep the figure out of pyplot's registry; it lives as long as the cache entry
+        plt.close(fig)
+        FigureCanvasAgg(fig)
+        if dpi:
+            fig.set_dpi(dpi)
+        self.chart = chart
+        self.fig = fig
+        self.layer = layer
+        self._update = update
+        self._background = None
+        self._lock = threading.Lock()
+        width, height = fig.canvas.get_width_height()
+        self.nbytes = width * height * 4
+
+    def png(self, **player):
+        """PNG bytes of the chart for one player (the arguments of the layer's ``update``)."""
+        with self._lock:
+            with stage(f"chart.draw.{self.chart}"):
+                self._update(**player)
+                canvas = self.fig.canvas
+                if self._background is None:
+                    for artist in self.layer:
+                        artist.set_animated(True)
+                    canvas.draw()
+                    self._background = canvas.copy_from_bbox(self.fig.bbox)
+                else:
+                    canvas.restore_region(self._background)
+                for artist in self.layer:
+                    self.fig.draw_artist(artist)
+            with stage(f"chart.encode.{self.chart}"):
+                return self._crop(canvas)
+
+    def _crop(self, canvas):
+        fig = self.fig
+        renderer = canvas.get_renderer()
+        bbox = fig.get_tightbbox(renderer)
+        if (bbox.x0 < 0 or bbox.y0 < 0 or bbox.x1 > fig.get_figwidth()
+                or bbox.y1 > fig.get_figheight()):
+            # something pokes out of the canvas (a very long name): draw it the slow way
+            return self._savefig()
+        dpi = fig.dpi
+        padded = bbox.padded(PAD_INCHES)
+        # same pixel size savefig gives the padded box, anchored at its bottom-left corner
+        height = canvas.get_width_height()[1]
+        left, bottom = round(padded.x0 * dpi), round(height - padded.y0 * dpi)
+        right, top = left + int(padded.width * dpi), bottom - int(padded.height * dpi)
+
+        pixels = np.asarray(canvas.buffer_rgba())
+        out = np.empty((bottom - top, right - left, 4), dtype=np.uint8)
+        out[:] = np.round(np.array(to_rgba(fig.get_facecolor())) * 255).astype(np.uint8)
+        src_top, src_left = max(top, 0), max(left, 0)
+        src_bottom, src_right = min(bottom, pixels.shape[0]), min(right, pixels.shape[1])
+        out[src_top - top:src_bottom - top, src_left - left:src_right - left] = \
+            pixels[src_top:src_bottom, src_left:src_right]
+
+        buf = io.BytesIO()
+        matplotlib.image.imsave(buf, out, format="png", dpi=dpi)
+        return buf.getvalue()
+
+    def _savefig(self):
+        for artist in self.layer:
+            artist.set_animated(False)
+        try:
+            return figure_bytes(self.fig, fmt="png", dpi=self.fig.dpi, close=False)
+        finally:
+            for artist in self.layer:
+                artist.set_animated(True)
+            # the full redraw painted this player into the canvas; re-grab a clean one
+            self._background = None
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        # images: the base keeps them alive, so their id can't be reused meanwhile
+        return id(value)
+    return value
+
+
+def chart_base(chart, dpi=None, **static):
+    """The cached :class:`ChartBase` for ``chart`` with these static inputs."""
+    key = (chart, dpi) + tuple((name, _freeze(value)) for name, value in sorted(static.items()))
+    return base_cache.get_or_create(key, lambda: ChartBase(chart, dpi=dpi, **static))[0]
+
+
+def render_png(chart, static, player, dpi=None):
+    """PNG bytes for ``chart``: ``static`` picks (or builds) the base, ``player`` the layer."""
+    return chart_base(chart, dpi=dpi, **static).png(**player)
+
+
+def chart_figure(chart, static, player):
+    """A standalone figure for ``chart`` (for vector output, where blitting doesn't apply)."""
+    fig, _, update = BUILDERS[chart](**static)
+    update(**player)
+    return fig
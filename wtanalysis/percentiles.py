@@ -0,0 +1,217 @@
+"""Percentile ranks of template metrics within a position cohort.
+
+Ranks are either computed within the player's own cohort (the original
+Pizza definition, :func:`cohort_percentiles`) or looked up against a pooled
+reference cohort, e.g. several leagues' wingers, held as sorted arrays per
+metric (:class:`ReferenceDistribution`). The charts' axis ranges and cohort
+averages are memoised alongside (:func:`cohort_ranges`).
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from .cache import LRUCache
+from .timing import stage
+
+# Keyed by (dataset key, position, minute threshold, metric columns). Each
+# entry is a cohort-sized frame of 15 floats per player, so this can be
+# generous; switching players inside one cohort is then free.
+percentile_cache = LRUCache(maxsize=256, name="percentiles")
+
+
+def percentile_ranks(values):
+    """Rank each column of a 2-D array, as a 0-100 percentile.
+
+    Same definition the Pizza chart has always used - average rank over the
+    cohort size - but computed for every column in one ``rankdata`` call.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return values.copy()
+    return rankdata(values, method='average', axis=0) / len(values) * 100
+
+
+def cohort_percentiles(dataset, position, min_minutes, cols):
+    """Percentile ranks of ``cols`` for every ``position`` player above ``min_minutes``.
+
+    Returns a frame indexed like ``dataset.frame`` (only the cohort's rows)
+    with one column per metric. Results are memoised per dataset, position,
+    minute threshold and metric list, and are shared - don't modify them.
+    """
+    cols = tuple(cols)
+    key = (dataset.key, position, min_minutes, cols)
+
+    def build():
+        with stage("rank.cohort"):
+            cohort = dataset.frame.iloc[dataset.cohort_rows(position, min_minutes)]
+            ranks = percentile_ranks(cohort[list(cols)].to_numpy(dtype=float))
+            return pd.DataFrame(ranks, index=cohort.index, columns=list(cols))
+
+    return percentile_cache.get_or_create(key, build)[0]
+
+
+# (low, high, average) per (dataset key, position, minute threshold, metric columns)
+range_cache = LRUCache(maxsize=256, name="ranges")
+
+
+def metric_ranges(frame, cols):
+    """``(low, high, average)`` lists of ``cols`` over ``frame``, rounded to 2dp."""
+    # float64 before rounding, so float32 metrics don't show as 0.3499999940395355
+    values = frame[cols].apply(pd.to_numeric, errors="coerce").astype(float)
+    return (values.min().values.round(2).tolist(),
+            values.max().values.round(2).tolist(),
+            values.mean().values.round(2).tolist())
+
+
+def cohort_ranges(dataset, position, min_minutes, cols):
+    """``(low, high, average)`` lists of ``cols`` over the ``position`` cohort, rounded to 2dp.
+
+    ``min_minutes=None`` takes every player at the position, whatever their
+    minutes (the Radar's cohort). Memoised, so every chart and comparison
+    of the cohort shares one pass over it; the lists are shared - don't
+    modify them.
+    """
+    cols = tuple(cols)
+    key = (dataset.key, position, min_minutes, cols)
+
+    def build():
+        if min_minutes is None:
+            rows = dataset.rows_for_position(position)
+        else:
+            rows = dataset.cohort_rows(position, min_minutes)
+        with stage("rank.ranges"):
+            return metric_ranges(dataset.frame.iloc[rows], list(cols))
+
+    return range_cache.get_or_create(key, build)[0]
+
+
+# Default minute ladder for the precomputed cube
+DEFAULT_THRESHOLDS = (0, 450, 900, 1350)
+
+# One cube per (dataset, templates, thresholds); they're small (float32).
+cube_cache = LRUCache(maxsize=8, name="percentile_cubes")
+
+
+class PercentileCube:
+    """Percentile ranks for every template position at a ladder of minute thresholds.
+
+    For each position the cube holds a float32 array shaped
+    ``(thresholds, players at that position, metrics)``; players below a
+    threshold are left as NaN in that slice. It is filled position by position on a
+    daemon thread, and :meth:`percentiles` falls back to
+    :func:`cohort_percentiles` for anything not (yet) in the cube, so callers
+    never wait for the precompute.
+    """
+
+    def __init__(self, dataset, templates, thresholds=DEFAULT_THRESHOLDS):
+        self.dataset = dataset
+        self.templates = {pos: tuple(cols) for pos, cols in templates.items() if cols}
+        self.thresholds = tuple(sorted(set(thresholds)))
+        self._slices = {}
+        self._thread = None
+        self.done = threading.Event()
+
+    def start(self):
+        """Fill the cube in the background; returns immediately."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._fill, name="percentile-cube", daemon=True)
+            self._thread.start()
+        return self
+
+    def _fill(self):
+        try:
+            for position, cols in self.templates.items():
+                with stage("rank.cube"):
+                    self._slices[position] = self._build(position, cols)
+        finally:
+            self.done.set()
+
+    def _build(self, position, cols):
+        frame = self.dataset.frame
+        rows = self.dataset.rows_for_position(position)
+        values = frame[list(cols)].to_numpy(dtype=float)[rows]
+        minutes = frame['Minutes played'].to_numpy()[rows]
+        cube = np.full((len(self.thresholds), len(rows), len(cols)), np.nan, dtype=np.float32)
+        for t, threshold in enumerate(self.thresholds):
+            keep = minutes >= threshold
+            cube[t, keep] = percentile_ranks(values[keep])
+        return rows, minutes, cube
+
+    def percentiles(self, position, min_minutes, cols):
+        """Same result as :func:`cohort_percentiles`, served from the cube when possible."""
+        cols = tuple(cols)
+        entry = self._slices.get(position)
+        if (entry is None or min_minutes not in self.thresholds
+                or self.templates.get(position) != cols):
+            return cohort_percentiles(self.dataset, position, min_minutes, cols)
+        rows, minutes, cube = entry
+        keep = minutes >= min_minutes
+        ranks = cube[self.thresholds.index(min_minutes)][keep]
+        index = self.dataset.frame.index[rows[keep]]
+        return pd.DataFrame(ranks, index=index, columns=list(cols))
+
+
+def percentile_cube(dataset, templates, thresholds=DEFAULT_THRESHOLDS):
+    """Return the (started) :class:`PercentileCube` for ``dataset``, building it once."""
+    thresholds = tuple(sorted(set(thresholds)))
+    template_key = tuple(sorted((pos, tuple(cols)) for pos, cols in templates.items()))
+    key = (dataset.key, template_key, thresholds)
+    cube, _ = cube_cache.get_or_create(
+        key, lambda: PercentileCube(dataset, templates, thresholds).start())
+    return cube
+
+
+# Sorted reference cohorts by (pool dataset, position, minute threshold, columns)
+reference_cache = LRUCache(maxsize=64, name="references")
+
+
+class ReferenceDistribution:
+    """Sorted values of each metric over a reference cohort.
+
+    A percentile lookup is a pair of binary searches per metric instead of a
+    re-rank of the pooled cohort. For a value that is in the reference this
+    gives exactly the average-rank percentile :func:`percentile_ranks`
+    gives it; values outside the reference are placed between their
+    neighbours and clipped to 0-100. Missing values are left out of the
+    reference and get a missing percentile.
+    """
+
+    def __init__(self, values, cols):
+        values = np.asarray(values, dtype=float).reshape(-1, len(cols))
+        self.cols = tuple(cols)
+        # NaNs sort last; counts marks where each column's real values end
+        self.sorted = np.sort(values, axis=0)
+        self.counts = np.count_nonzero(~np.isnan(values), axis=0)
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def percentiles(self, values):
+        """0-100 percentile of each row of ``values`` (one column per metric)."""
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        out = np.full(values.shape, np.nan)
+        for j, count in enumerate(self.counts):
+            if not count:
+                continue
+            reference = self.sorted[:count, j]
+            left = np.searchsorted(reference, values[:, j], side="left")
+            right = np.searchsorted(reference, values[:, j], side="right")
+            out[:, j] = (left + right + 1) / (2 * count) * 100
+        out[np.isnan(values)] = np.nan
+        return np.clip(out, 0, 100)
+
+
+def reference_distribution(pool, position, min_minutes, cols):
+    """The :class:`ReferenceDistribution` of ``pool``'s ``position`` cohort, built once."""
+    cols = tuple(cols)
+    key = (pool.key, position, min_minutes, cols)
+
+    def build():
+        with stage("rank.reference"):
+            cohort = pool.frame.iloc[pool.cohort_rows(position, min_minutes)]
+            return ReferenceDistribution(cohort[list(cols)].to_numpy(dtype=float), cols)
+
+    return reference_cache.get_or_create(key, build)[0]
@@ -0,0 +1,167 @@
+"""Stable player keys, and combining a player's transfer splits.
+
+Names alone don't identify a player: two players can share "J. Rodríguez",
+and a player who moved mid-season is listed once per club. Every row gets a
+*player key* instead:
+
+* ``id:<ID>`` when the export has a Wyscout ID column;
+* otherwise the name, current ``Team`` and birth date (those that are
+  present) joined with ``|``.
+
+Wyscout's ``Team`` is the player's current club on every split, while
+``Team within selected timeframe`` is the club the split was played for,
+so the splits of one transfer share a key. In a merged store the league and
+season are part of the key: a player's seasons stay apart, and a move
+between leagues leaves one line in each league's cohort.
+
+:func:`combine_frame` turns the rows of each key into a single season line:
+rates - "per 90", "%" and "PAdj" columns - are averaged weighted by minutes
+played, every other numeric column (minutes, matches, goals...) is a total
+and summed, and the descriptive columns come from the split with the most
+minutes.
+``Dataset.combined`` applies it once per dataset, so cohorts count each
+player once; :func:`combine_rows` does the same for one player's rows.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api import types
+
+from .dataset import LEAGUE_COLUMN, SEASON_COLUMN
+from .dtypes import ID_COLUMNS
+
+BIRTH_DATE_COLUMNS = ("Birth date", "Date of birth", "Birthday")
+
+# Wyscout's markers for a rate ("Goals per 90", "Accurate passes, %", "PAdj Interceptions")
+RATE_MARKERS = ("per 90", "%")
+RATE_PREFIXES = ("PAdj",)
+
+# Numeric columns that describe the player rather than their season
+INFO_COLUMNS = ("Age", "Market value", "Height", "Weight")
+
+
+def _first_column(frame, names):
+    return next((name for name in names if name in frame.columns), None)
+
+
+def _text(col):
+    return col.astype(object).where(col.notna(), "").astype(str)
+
+
+def player_keys(frame):
+    """The player key of every row of ``frame``, as an object array."""
+    tags = [_text(frame[name]) for name in (LEAGUE_COLUMN, SEASON_COLUMN) if name in frame.columns]
+    parts = [_text(frame[name]) for name in ("Team", _first_column(frame, BIRTH_DATE_COLUMNS))
+             if name and name in frame.columns]
+    keys = _text(frame["Player"]).str.cat(parts + tags, sep="|") if parts + tags \
+        else _text(frame["Player"])
+    id_column = _first_column(frame, ID_COLUMNS)
+    if id_column is not None:
+        ids = frame[id_column]
+        if types.is_float_dtype(ids.dtype):
+            ids = ids.astype("Int64")
+        ids = _text(ids).str.cat(tags, sep="|") if tags else _text(ids)
+        keys = ("id:" + ids).where(frame[id_column].notna(), keys)
+    return keys.to_numpy(dtype=object)
+
+
+def key_index(keys):
+    """``{key: row numbers}`` for a key array (positional rows, in row order)."""
+    if not len(keys):
+        return {}
+    groups = pd.Series(np.arange(len(keys))).groupby(keys, sort=False).indices
+    return {key: rows.astype(np.intp) for key, rows in groups.items()}
+
+
+def is_total(column):
+    """Whether ``column`` counts something that adds up across a player's splits.
+
+    Judged by the name: Wyscout labels every rate, so any other season
+    column is a count.
+    """
+    name = str(column)
+    return not (any(marker in name for marker in RATE_MARKERS)
+                or name.lstrip().startswith(RATE_PREFIXES))
+
+
+def _combinable(frame):
+    # numeric season columns: summed or minutes-weighted when splits are merged
+    return [name for name, col in frame.items()
+            if name not in INFO_COLUMNS and name not in ID_COLUMNS
+            and types.is_numeric_dtype(col.dtype) and not types.is_bool_dtype(col.dtype)]
+
+
+def combine_frame(frame, keys):
+    """``frame`` with the rows that share a key merged into one season line each.
+
+    Returns ``(combined, rows)``: ``rows`` are the positional row numbers of
+    each output row's main split (the one with the most minutes, first on
+    ties), whose label, text columns, age and so on the merged line keeps.
+    Totals (see :func:`is_total`) are summed and rates averaged weighted by
+    minutes played; where none of a player's splits has minutes for a
+    value, that value is a plain mean. Everything is one groupby over the
+    rows with splits, whatever the number of players. Rows are in file
+    order, and a frame without splits comes back as is.
+    """
+    keys = np.asarray(keys, dtype=object)
+    shared = pd.Series(keys).duplicated(keep=False).to_numpy()
+    if not shared.any():
+        return frame, np.arange(len(frame))
+    split_rows = np.flatnonzero(shared)
+    codes, _ = pd.factorize(keys[shared])
+    minutes = pd.to_numeric(frame["Minutes played"].iloc[split_rows], errors="coerce")
+    minutes = minutes.fillna(0).to_numpy(dtype=float)
+
+    # main split of each player: sorted by player, most minutes first
+    order = np.lexsort((split_rows, -minutes, codes))
+    first = np.r_[True, codes[order][1:] != codes[order][:-1]]
+    main = split_rows[order[first]]
+
+    columns = _combinable(frame)
+    values = frame.iloc[split_rows][columns].to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    values = np.where(present, values, 0.0)
+    weights = minutes[:, None] * present
+    grouped = pd.DataFrame(np.hstack([values * minutes[:, None], weights, values, present]))
+    sums = grouped.groupby(codes, sort=True).sum().to_numpy()
+    weighted, weight, plain, count = np.split(sums, 4, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(weight > 0, weighted / weight, plain / count)
+    totals = np.array([is_total(c) for c in columns])
+    merged = np.where(totals, np.where(count > 0, plain, np.nan), rate)
+
+    combined = frame.iloc[main].copy()
+    for i, name in enumerate(columns):
+        col = merged[:, i]
+        dtype = frame[name].dtype
+        if types.is_integer_dtype(dtype) and np.isfinite(col).all():
+            combined[name] = np.round(col).astype(dtype)
+        else:
+            combined[name] = col.astype(np.float32 if dtype == np.float32 else float)
+
+    rows = np.concatenate([np.flatnonzero(~shared), main])
+    in_order = np.argsort(rows, kind="stable")
+    result = pd.concat([frame.iloc[np.flatnonzero(~shared)], combined]).iloc[in_order]
+    return result, rows[in_order]
+
+
+def combine_rows(rows):
+    """One season line (a Series) from the rows of one player's transfer splits.
+
+    The single-player case of :func:`combine_frame`; labelled like the
+    split with the most minutes.
+    """
+    if len(rows) == 1:
+        return rows.iloc[0]
+    return combine_frame(rows, np.zeros(len(rows), dtype=object))[0].iloc[0]
+
+
+def season_line(rows, aggregate=False):
+    """The row the charts use for one player's rows (several after a transfer).
+
+    That is the split with the most minutes, or with ``aggregate`` every
+    split combined by :func:`combine_rows`.
+    """
+    if aggregate:
+        return combine_rows(rows)
+    minutes = pd.to_numeric(rows["Minutes played"], errors="coerce").fillna(-1).to_numpy()
+    return rows.iloc[int(np.argmax(minutes))]
@@ -0,0 +1,72 @@
+"""Splitting and normalising the Wyscout ``Position`` column.
+
+This is the only place positions are normalised: the player/position menus,
+every tab's cohort filter and the disk cache all use the position1..4
+columns produced here, and cohorts are looked up through
+:func:`build_position_index` instead of regex scans over ``Position``.
+"""
+import numpy as np
+import pandas as pd
+
+POSITION_COLUMNS = ['position1', 'position2', 'position3', 'position4']
+
+# Normalise a few variants so menus match the downstream filters.
+# LWB/RWB stay as wing-backs; they have their own menu entries and templates.
+REPLACEMENTS = {
+    'LWF': 'LW', 'RWF': 'RW', 'LCMF': 'CM', 'RCMF': 'CM',
+    'DMF': 'DM', 'RDMF': 'DM', 'LDMF': 'DM', 'AMF': 'AM',
+    'RAMF': 'RW', 'LAMF': 'LW', 'RCB': 'CB', 'LCB': 'CB'
+}
+
+
+def split_positions(frame):
+    """Split ``Position`` ("LCMF, DMF") into normalised position1..4 columns.
+
+    Returns a new frame with the same index as ``frame``; unused slots are
+    missing values.
+    """
+    pos_split = frame['Position'].astype(object).fillna('').astype(str).str.split(',', expand=True)
+    while pos_split.shape[1] < 4:
+        pos_split[pos_split.shape[1]] = None
+    pos_split = pos_split.iloc[:, :4]
+    pos_split.columns = POSITION_COLUMNS
+    for c in POSITION_COLUMNS:
+        col = pos_split[c].str.strip().replace(REPLACEMENTS)
+        pos_split[c] = col.where(col != '')
+    return pos_split
+
+
+def build_position_index(positions):
+    """Map each normalised position to the row numbers that list it.
+
+    ``positions`` is the frame from :func:`split_positions`. The result maps
+    e.g. ``'CM'`` to a sorted int array of positional (``iloc``) row numbers,
+    with each row appearing once even if it lists the position twice
+    ("LCMF, RCMF").
+    """
+    values = positions.to_numpy(dtype=object).ravel()
+    rows = np.repeat(np.arange(len(positions)), positions.shape[1])
+    present = pd.notna(values)
+    index = pd.Series(rows[present]).groupby(values[present]).unique()
+    return {pos: np.sort(r.astype(np.intp)) for pos, r in index.items()}
+
+
+# Menu order for a player's positions; anything else sorts after these
+POSITION_ORDER = ['GK', 'CB', 'LB', 'RB', 'LWB', 'RWB', 'DM', 'CM', 'AM', 'LW', 'RW', 'CF']
+
+
+def build_player_positions(players, positions):
+    """Map each player key to the positions they played, in menu order.
+
+    ``players`` holds one player key per row (``Dataset.player_keys``; a
+    ``Player`` column maps names instead) and ``positions`` is the matching
+    position1..4 frame. Everything is done in one melt/groupby pass so the
+    menus can look players up in a dict instead of scanning the frame.
+    """
+    long = positions.assign(Player=players.to_numpy()).melt(
+        id_vars='Player', value_vars=POSITION_COLUMNS, value_name='pos')
+    long = long.dropna(subset=['Player', 'pos']).drop_duplicates(['Player', 'pos'])
+    rank = {p: i for i, p in enumerate(POSITION_ORDER)}
+    long['rank'] = long['pos'].map(rank).fillna(len(POSITION_ORDER))
+    long = long.sort_values(['Player', 'rank', 'pos'], kind='stable')
+    return long.groupby('Player', sort=False)['pos'].agg(list).to_dict()
@@ -0,0 +1,243 @@
+"""Type-ahead player search over a dataset's names, teams and ages.
+
+A :class:`PlayerIndex` is built once per dataset (``Dataset.search_index``)
+and answers each keystroke with the top few matches, so the app's player
+menu only ever carries a handful of options instead of every name in a
+multi-league store.
+
+Names and teams are normalised with :func:`normalize` - accents stripped,
+case folded, punctuation to spaces - so "hudson odoi" finds "C. Hudson-Odoi"
+and "muller" finds "T. Müller". Each query word scores the best of:
+
+* the start of a name word (or of the name with its spaces closed up, so
+  "hudsonodoi" works too): 1;
+* the start of a team word: 0.6;
+* the player's age, for a number: 0.5;
+* the trigram overlap (Dice) with the closest name word, at least
+  ``MIN_FUZZY``, times 0.9 - this is what catches typos, so "hudosn" finds
+  "C. Hudson-Odoi" and "saak" finds "B. Saka".
+
+The trigram overlap of the whole query with the whole name is added to
+order players that match equally well word by word.
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from .dataset import LEAGUE_COLUMN
+
+NAME_WEIGHT = 1.0
+TEAM_WEIGHT = 0.6
+AGE_WEIGHT = 0.5
+
+# Trigram overlap (Dice) a query word needs with a name word to count as a typo of it
+MIN_FUZZY = 0.35
+FUZZY_WEIGHT = 0.9
+
+
+# Combining accents left behind by NFKD decomposition ("é" -> "e" + U+0301)
+_ACCENTS = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """``text`` lower-cased, without accents, with anything but letters and digits as spaces."""
+    text = _ACCENTS.sub("", unicodedata.normalize("NFKD", str(text))).casefold()
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def normalize_all(values):
+    """:func:`normalize` for a whole sequence, each distinct value once; an object array."""
+    codes, distinct = pd.factorize(pd.Series(values, dtype=object).fillna(""))
+    return np.array([normalize(v) for v in distinct], dtype=object)[codes]
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(grams, postings, counts):
+    # Dice overlap of ``grams`` with every posting target, or None when nothing shares one
+    hits = [postings[g] for g in grams if g in postings]
+    if not hits:
+        return None
+    shared = np.bincount(np.concatenate(hits), minlength=len(counts)).astype(np.float32)
+    return 2 * shared / (len(grams) + counts)
+
+
+def _prefix_tokens(name):
+    # every word, and every run of words to the end closed up ("hudsonodoi", "chudsonodoi")
+    words = name.split()
+    return set(words) | {"".join(words[i:]) for i in range(len(words) - 1)}
+
+
+def _flatten(tokens_per_entry):
+    # every token, and the entry it came from
+    tokens = [token for tokens in tokens_per_entry for token in tokens]
+    entries = np.repeat(np.arange(len(tokens_per_entry)), [len(t) for t in tokens_per_entry])
+    return tokens, entries
+
+
+class _Postings:
+    """``{label: values}`` for parallel label/value arrays, as one array sorted by label."""
+
+    def __init__(self, labels, values):
+        codes, distinct = pd.factorize(pd.Series(labels, dtype=object))
+        self._values = np.asarray(values)[np.argsort(codes, kind="stable")]
+        ends = np.cumsum(np.bincount(codes, minlength=len(distinct))).tolist()
+        self._slices = dict(zip(distinct, (slice(e - n, e) for e, n
+                                           in zip(ends, np.diff(ends, prepend=0).tolist()))))
+
+    def __contains__(self, label):
+        return label in self._slices
+
+    def __getitem__(self, label):
+        return self._values[self._slices[label]]
+
+
+class _Prefixes:
+    """Sorted (token, entry) pairs; the entries with a token starting with ``p`` are one slice."""
+
+    def __init__(self, tokens_per_entry):
+        tokens, entries = _flatten(tokens_per_entry)
+        tokens = np.array(tokens, dtype=str)
+        order = np.argsort(tokens, kind="stable")
+        self.tokens = tokens[order]
+        self.entries = entries[order]
+
+    def matching(self, prefix):
+        lo = np.searchsorted(self.tokens, prefix, side="left")
+        hi = np.searchsorted(self.tokens, prefix + "\U0010ffff", side="left")
+        return self.entries[lo:hi]
+
+
+class PlayerIndex:
+    """Normalised player names, teams and ages, prepared for prefix and fuzzy lookups.
+
+    ``players``, ``teams`` and ``ages`` are parallel sequences, one entry
+    per player, in the order an empty search lists them. ``keys`` (default:
+    the names) are what the app selects, so two players with one name are
+    two entries told apart by team and age - and by ``leagues``, for a
+    merged store.
+    """
+
+    def __init__(self, players, teams, ages, keys=None, leagues=None):
+        self.players = np.asarray(players, dtype=object)
+        self.leagues = None if leagues is None else np.asarray(leagues, dtype=object)
+        self.keys = self.players if keys is None else np.asarray(keys, dtype=object)
+        self.teams = np.asarray(teams, dtype=object)
+        self.ages = np.asarray(pd.to_numeric(pd.Series(ages), errors="coerce"), dtype=float)
+        self._entries = {key: i for i, key in enumerate(self.keys)}
+        names = normalize_all(self.players)
+        self._names = _Prefixes([_prefix_tokens(n) for n in names])
+        # teams repeat, so split each distinct one once
+        codes, distinct = pd.factorize(normalize_all(self.teams))
+        team_words = [set(n.split()) for n in distinct]
+        self._teams = _Prefixes([team_words[c] for c in codes])
+        # whole-name trigrams -> entries, for ordering
+        trigrams = [_trigrams(n) for n in names]
+        self._trigram_counts = np.array([len(t) for t in trigrams], dtype=np.float32)
+        self._postings = _Postings(*_flatten(trigrams))
+        # distinct name words -> entries, and their trigrams -> words, for typos
+        words, word_entries = _flatten([set(n.split()) for n in names])
+        word_codes, vocabulary = pd.factorize(pd.Series(words, dtype=object))
+        self._word_entries = _Postings(word_codes, word_entries)
+        word_trigrams = [_trigrams(w) for w in vocabulary]
+        self._word_trigram_counts = np.array([len(t) for t in word_trigrams], dtype=np.float32)
+        self._word_postings = _Postings(*_flatten(word_trigrams))
+
+    @classmethod
+    def from_frame(cls, frame, keys=None):
+        """One entry per distinct key (default: ``Player``) of ``frame``, by name.
+
+        ``keys`` holds one player key per row; each entry takes the team and
+        age of its key's first row.
+        """
+        keys = frame["Player"].astype(object).to_numpy() if keys is None else np.asarray(keys)
+        first = ~pd.Series(keys).duplicated().to_numpy() & frame["Player"].notna().to_numpy()
+        rows, keys = frame[first], keys[first]
+        order = np.argsort(rows["Player"].astype(str).to_numpy(), kind="stable")
+        rows, keys = rows.iloc[order], keys[order]
+        teams = pd.Series("", index=rows.index, dtype=object)
+        for col in ("Team within selected timeframe", "Team"):
+            if col in rows.columns:
+                values = rows[col].astype(object)
+                teams = values.where(values.notna(), teams)
+        ages = rows["Age"] if "Age" in rows.columns else np.full(len(rows), np.nan)
+        leagues = (rows[LEAGUE_COLUMN].astype(object).to_numpy()
+                   if LEAGUE_COLUMN in rows.columns else None)
+        return cls(rows["Player"].astype(str).to_numpy(), teams.to_numpy(), ages, keys, leagues)
+
+    def __len__(self):
+        return len(self.players)
+
+    def scores(self, query):
+        """Match score of every entry for ``query`` (0 means no match)."""
+        words = normalize(query).split()
+        scores = np.zeros(len(self), dtype=np.float32)
+        if not words:
+            return scores
+        for word in words:
+            best = np.zeros(len(self), dtype=np.float32)
+            # lowest weight first, so a word matching several ways keeps the best
+            if word.isdigit():
+                best[self.ages == int(word)] = AGE_WEIGHT
+            best[self._teams.matching(word)] = TEAM_WEIGHT
+            self._typos(word, best)
+            best[self._names.matching(word)] = NAME_WEIGHT
+            scores += best
+        dice = _dice(_trigrams(" ".join(words)), self._postings, self._trigram_counts)
+        if dice is not None:
+            scores += np.where(scores > 0, dice, 0)
+        return scores
+
+    def _typos(self, word, best):
+        # raise ``best`` to FUZZY_WEIGHT x the overlap with each entry's closest name word
+        dice = _dice(_trigrams(word), self._word_postings, self._word_trigram_counts)
+        if dice is None:
+            return
+        close = np.flatnonzero(dice >= MIN_FUZZY)
+        if not len(close):
+            return
+        entries = [self._word_entries[w] for w in close]
+        scores = np.repeat(dice[close] * FUZZY_WEIGHT, [len(e) for e in entries])
+        np.maximum.at(best, np.concatenate(entries), scores.astype(best.dtype))
+
+    def search(self, query, limit=20):
+        """Positions of the best ``limit`` entries for ``query``, best first.
+
+        An empty query returns the first ``limit`` entries (alphabetical,
+        from :meth:`from_frame`).
+        """
+        if not normalize(query):
+            return np.arange(min(limit, len(self)))
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        # best first; ties in entry order
+        return matched[np.lexsort((matched, -scores[matched]))]
+
+    def find(self, key):
+        """Entry of the player with key ``key``, or ``None``."""
+        return self._entries.get(key)
+
+    def label(self, i):
+        """"Name · Team · League · age" for entry ``i`` (the parts it has), for menus."""
+        parts = [self.players[i]]
+        if self.teams[i]:
+            parts.append(str(self.teams[i]))
+        if self.leagues is not None and pd.notna(self.leagues[i]):
+            parts.append(str(self.leagues[i]))
+        if not np.isnan(self.ages[i]):
+            parts.append(str(int(self.ages[i])))
+        return " · ".join(parts)
+
+    def matches(self, query, limit=20):
+        """The best ``limit`` matches for ``query`` as a frame of Player, Team, Age and Key."""
+        top = self.search(query, limit)
+        return pd.DataFrame({"Player": self.players[top], "Team": self.teams[top],
+                             "Age": self.ages[top], "Key": self.keys[top]})
@@ -0,0 +1,144 @@
+"""Find players whose template percentiles look like a given player's.
+
+Each player is a vector of percentile ranks over a position template. A
+:class:`SimilarityIndex` holds those vectors for one cohort (a league, or
+a pooled multi-league store) and answers nearest-neighbour queries with one
+matrix-vector product, so a 50k-player pool is a few milliseconds per query.
+"""
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .dataset import LEAGUE_COLUMN
+from .percentiles import cohort_percentiles, reference_distribution
+from .players import season_line
+from .templates import TEMPLATES
+from .timing import stage
+
+METRICS = ("cosine", "euclidean")
+
+# Indexes by (pool dataset, position, minute threshold, columns)
+similarity_cache = LRUCache(maxsize=32, name="similarity")
+
+
+class SimilarityIndex:
+    """Percentile vectors of a cohort, prepared for cosine and Euclidean queries.
+
+    ``labels`` are the cohort's frame labels, ``keys`` their player keys and
+    ``info`` a frame (same order) of what to show per player. Cosine similarity is taken around the
+    50th percentile, so "above average at the same things" matches rather
+    than "high overall"; missing percentiles count as 50.
+    """
+
+    def __init__(self, labels, info, matrix, cols, keys=None):
+        self.labels = np.asarray(labels)
+        self.keys = None if keys is None else np.asarray(keys, dtype=object)
+        self.info = info.reset_index(drop=True)
+        self.cols = tuple(cols)
+        matrix = np.nan_to_num(np.asarray(matrix, dtype=np.float32), nan=50.0)
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        centred = matrix - 50.0
+        norms = np.linalg.norm(centred, axis=1)
+        self.unit = centred / np.where(norms == 0, 1, norms)[:, None]
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def scores(self, vector, metric="cosine"):
+        """Similarity (cosine, higher is closer) or distance (Euclidean) to every player."""
+        vector = np.nan_to_num(np.asarray(vector, dtype=np.float32), nan=50.0)
+        if metric == "cosine":
+            centred = vector - 50.0
+            norm = np.linalg.norm(centred)
+            return self.unit @ (centred / norm if norm else centred)
+        if metric == "euclidean":
+            # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, one mat-vec for the whole pool
+            sq = self.sq_norms + vector @ vector - 2 * (self.matrix @ vector)
+            return np.sqrt(np.maximum(sq, 0))
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+
+    def query(self, vector, k=10, metric="cosine", exclude=None):
+        """The ``k`` nearest players as a frame, closest first.
+
+        ``exclude`` is a boolean mask (index order) of players to leave out,
+        e.g. the query player. Cosine results carry a ``Similarity`` (-100 to
+        100), Euclidean ones a ``Distance`` as the RMS percentile gap.
+        """
+        scores = self.scores(vector, metric)
+        order_scores = -scores if metric == "cosine" else scores
+        if exclude is not None:
+            order_scores = np.where(exclude, np.inf, order_scores)
+        k = min(k, int(np.isfinite(order_scores).sum()))
+        if k <= 0:
+            return self.info.iloc[:0]
+        top = np.argpartition(order_scores, k - 1)[:k]
+        top = top[np.argsort(order_scores[top], kind="stable")]
+        result = self.info.iloc[top].copy()
+        if metric == "cosine":
+            result["Similarity"] = np.round(scores[top].astype(float) * 100, 1)
+        else:
+            result["Distance"] = np.round(scores[top].astype(float) / np.sqrt(len(self.cols)), 1)
+        return result.reset_index(drop=True)
+
+
+def _teams(cohort):
+    # team_name() for every row at once
+    teams = pd.Series("", index=cohort.index, dtype=object)
+    for col in ("Team within selected timeframe", "Team"):
+        if col in cohort.columns:
+            values = cohort[col].astype(object)
+            teams = values.where(values.notna(), teams)
+    return teams.to_numpy()
+
+
+def _info(cohort):
+    info = pd.DataFrame({"Player": cohort["Player"].to_numpy(), "Team": _teams(cohort)})
+    if LEAGUE_COLUMN in cohort.columns:
+        info["League"] = cohort[LEAGUE_COLUMN].astype(object).to_numpy()
+    if "Minutes played" in cohort.columns:
+        info["Minutes played"] = cohort["Minutes played"].to_numpy()
+    return info
+
+
+def similarity_index(pool, position, min_minutes, cols):
+    """The :class:`SimilarityIndex` of ``pool``'s ``position`` cohort, built once."""
+    cols = tuple(cols)
+    key = (pool.key, position, min_minutes, cols)
+
+    def build():
+        rows = pool.cohort_rows(position, min_minutes)
+        cohort = pool.frame.iloc[rows]
+        matrix = cohort_percentiles(pool, position, min_minutes, cols)
+        with stage("similar.index"):
+            return SimilarityIndex(cohort.index, _info(cohort), matrix.to_numpy(), cols,
+                                   keys=pool.player_keys[rows])
+
+    return similarity_cache.get_or_create(key, build)[0]
+
+
+def similar_players(dataset, player, position, min_minutes=0, k=10, metric="cosine",
+                    pool=None, cols=None, aggregate=False):
+    """The ``k`` players in ``pool`` (default: ``dataset``) most like ``player``.
+
+    The player's row comes from ``dataset``; their percentile vector is
+    looked up against the pool's cohort, so a Championship winger can be
+    matched against Premier League and Bundesliga wingers on the same scale.
+    ``player`` is a player key or a name, and ``aggregate`` combines their
+    transfer splits (:func:`~wtanalysis.players.season_line`); every row of
+    the player is left out of the results. ``cols`` defaults to the
+    position's template. Returns an empty frame when the player isn't in
+    the cohort.
+    """
+    pool = dataset if pool is None else pool
+    cols = TEMPLATES[position].columns if cols is None else tuple(cols)
+    rows = dataset.player_rows(player, dataset.cohort_rows(position, min_minutes))
+    index = similarity_index(pool, position, min_minutes, cols)
+    if not len(rows) or not len(index):
+        return index.info.iloc[:0]
+    row = season_line(dataset.frame.iloc[rows], aggregate)
+    values = pd.to_numeric(row[list(cols)], errors="coerce").to_numpy(dtype=float)[None, :]
+    vector = reference_distribution(pool, position, min_minutes, cols).percentiles(values)[0]
+    exclude = index.keys == dataset.player_keys[rows[0]]
+    with stage("similar.query"):
+        return index.query(vector, k=k, metric=metric, exclude=exclude)
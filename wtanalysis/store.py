@@ -0,0 +1,107 @@
+"""Several Wyscout exports merged into one dataset, tagged by league and season.
+
+Each workbook is still parsed once per content hash (:mod:`wtanalysis.ingest`);
+the merged dataset is keyed by the ordered list of (file, league, season)
+parts. Adding a file to an upload that was already merged appends just
+that file's rows to the cached merge, and nothing is re-read when the
+merge itself is cached. Per-league views come from
+:meth:`Dataset.select <wtanalysis.dataset.Dataset.select>`.
+"""
+import hashlib
+import os
+import re
+import time
+
+import pandas as pd
+
+from .assets import LEAGUE_IMAGE_MAP
+from .cache import LRUCache
+from .dataset import LEAGUE_COLUMN, SEASON_COLUMN, Dataset
+from .dtypes import compact_frame
+from .ingest import content_hash, load_workbook
+from .timing import stage
+
+# Merged datasets by part list; a merge of 25 league exports is tens of MB
+merge_cache = LRUCache(maxsize=4, name="merges")
+
+_SEASON = re.compile(r"(?<!\d)(\d{4})\s*[-/_ ]\s*(\d{2}|\d{4})(?!\d)|(?<!\d)(\d{4})(?!\d)")
+
+
+def _normalise(text):
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def guess_tags(filename, leagues=None):
+    """``(league, season)`` guessed from an export's file name.
+
+    The league is the longest known league name (``LEAGUE_IMAGE_MAP`` by
+    default) found in the name, or the file stem; the season is the first
+    "2024-25" / "2024/2025" / "2024" in it, as ``"2024/25"`` or ``"2024"``.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    name = f" {_normalise(stem)} "
+    known = sorted(leagues if leagues is not None else LEAGUE_IMAGE_MAP, key=len, reverse=True)
+    league = next((lg for lg in known if f" {_normalise(lg)} " in name), stem)
+    match = _SEASON.search(stem)
+    if match is None:
+        season = ""
+    elif match.group(1):
+        season = f"{match.group(1)}/{match.group(2)[-2:]}"
+    else:
+        season = match.group(3)
+    return league, season
+
+
+def _merge_key(parts):
+    spec = "\x1e".join(f"{key}\x1f{league}\x1f{season}" for key, league, season in parts)
+    return "merge-" + hashlib.sha1(spec.encode()).hexdigest()
+
+
+def _tagged(dataset, league, season):
+    n = len(dataset.frame)
+    tags = pd.DataFrame({LEAGUE_COLUMN: [league] * n, SEASON_COLUMN: [season] * n},
+                        index=dataset.frame.index)
+    return pd.concat([dataset.frame, tags], axis=1), dataset.positions
+
+
+def _append(base, datasets, key, start):
+    frames, positions = [], []
+    if base is not None:
+        frames.append(base.frame)
+        positions.append(base.positions)
+    for dataset, league, season in datasets:
+        frame, pos = _tagged(dataset, league, season)
+        frames.append(frame)
+        positions.append(pos)
+    # concat turns categoricals with differing categories into plain text, so re-compact
+    with stage("merge.concat"):
+        frame = compact_frame(pd.concat(frames, ignore_index=True))
+        merged_positions = compact_frame(pd.concat(positions, ignore_index=True))
+    return Dataset(key, frame, merged_positions,
+                   parse_seconds=time.perf_counter() - start, source="merge")
+
+
+def merge_workbooks(files):
+    """Merge ``[(raw bytes, league, season), ...]`` into one tagged :class:`Dataset`.
+
+    Returns ``(dataset, parsed)`` where ``parsed`` counts the workbooks that
+    had to be loaded for this call (0 when the merge was cached).
+    """
+    start = time.perf_counter()
+    parts = [(content_hash(raw), league, season) for raw, league, season in files]
+    key = _merge_key(parts)
+    merged = merge_cache.get(key)
+    if merged is not None:
+        return merged, 0
+
+    # longest already-merged prefix of this upload, if any
+    base, done = None, 0
+    for n in range(len(parts) - 1, 0, -1):
+        base = merge_cache.get(_merge_key(parts[:n]))
+        if base is not None:
+            done = n
+            break
+    new = [(load_workbook(raw)[0], league, season) for raw, league, season in files[done:]]
+    merged = _append(base, new, key, start)
+    merge_cache.put(key, merged)
+    return merged, len(new)
@@ -0,0 +1,180 @@
+"""Chunked ingestion for exports too big to read whole.
+
+``pd.read_excel`` materialises every column of every row as Python objects
+before anything is filtered. :func:`stream_workbook` instead walks the sheet
+with openpyxl's read-only reader (or ``pd.read_csv`` in chunks for CSV
+exports), ``chunk_rows`` rows at a time, keeping only the identity columns
+and the columns the position templates use; each chunk is compacted before
+the next one is read. Peak memory is then one chunk plus those columns of
+the rows read so far, never the whole sheet as Python objects.
+
+The minute threshold and the positions are applied per player key once the
+whole file is read: a player's transfer splits can be in different chunks,
+and each split may be under the threshold while their season is not. Every
+row of a player who passes is kept, so ``Dataset.combined`` merges the same
+splits as it does for a full load.
+
+Streamed datasets go through the same in-memory and disk caches as full
+loads, keyed by the file's content and the import filters.
+"""
+import hashlib
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .dataset import LEAGUE_COLUMN, SEASON_COLUMN, Dataset
+from .dtypes import ID_COLUMNS, compact_frame
+from .ingest import _read_disk, _write_disk, content_hash, workbook_cache
+from .players import BIRTH_DATE_COLUMNS, player_keys
+from .positions import POSITION_COLUMNS, split_positions
+from .templates import TEMPLATES
+from .timing import stage
+
+# Player details the app shows and filters on besides the template metrics, and
+# those the player keys are made of (see wtanalysis.players)
+IDENTITY_COLUMNS = (
+    "Player", "Team", "Team within selected timeframe", "Position", "Age", "Market value",
+    "Contract expires", "Matches played", "Minutes played", "Birth country",
+    "Passport country", "Foot", "Height", "Weight", "On loan", LEAGUE_COLUMN, SEASON_COLUMN,
+    *ID_COLUMNS, *BIRTH_DATE_COLUMNS,
+)
+
+# Identity columns that are numbers; template metrics always are
+NUMERIC_IDENTITY = (
+    "Age", "Market value", "Matches played", "Minutes played", "Height", "Weight", *ID_COLUMNS,
+)
+
+CHUNK_ROWS = 20000
+
+
+def stream_columns(templates=None):
+    """Identity columns plus every column a template uses, in that order."""
+    templates = TEMPLATES if templates is None else templates
+    columns = list(IDENTITY_COLUMNS)
+    for template in templates.values():
+        columns += [c for c in template.columns if c not in columns]
+    return columns
+
+
+def _xlsx_chunks(source, chunk_rows):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame.from_records(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(source, chunk_rows, keep):
+    yield from pd.read_csv(source, chunksize=chunk_rows, usecols=lambda c: c in keep)
+
+
+def _filter_chunk(chunk, keep):
+    chunk = chunk[[c for c in chunk.columns if c in keep]]
+    for name in chunk.columns:
+        if name in NUMERIC_IDENTITY or (name not in IDENTITY_COLUMNS):
+            chunk[name] = pd.to_numeric(chunk[name], errors="coerce")
+    split = split_positions(chunk) if "Position" in chunk.columns else None
+    # compact each chunk so the kept rows never sit around as object columns
+    return compact_frame(chunk), split
+
+
+def _wanted_rows(frame, split, min_minutes, positions):
+    # every row of the players whose rows together pass the minute floor and positions
+    keys = player_keys(frame) if len(frame) and "Player" in frame.columns else None
+    mask = np.ones(len(frame), dtype=bool)
+    if keys is None:
+        return mask
+    if min_minutes and "Minutes played" in frame.columns:
+        minutes = pd.Series(frame["Minutes played"].to_numpy(dtype=float))
+        mask &= (minutes.groupby(keys).transform("sum") >= min_minutes).to_numpy()
+    if positions and "Position" in frame.columns:
+        wanted = pd.Series(split.isin(positions).any(axis=1).to_numpy())
+        mask &= wanted.groupby(keys).transform("any").to_numpy(dtype=bool)
+    return mask
+
+
+def _file_hash(path, block=1 << 20):
+    # same key as content_hash() of the file's bytes, without holding them all
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for data in iter(lambda: fh.read(block), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def _stream_key(digest, min_minutes, positions, columns):
+    # "by key": filtered per player key rather than per row, as earlier cached files were
+    spec = repr(("by key", min_minutes, sorted(positions or ()), list(columns)))
+    return f"{digest}-stream-{hashlib.sha1(spec.encode()).hexdigest()[:16]}"
+
+
+def stream_workbook(source, min_minutes=0, positions=None, columns=None, chunk_rows=CHUNK_ROWS,
+                    csv=None):
+    """A :class:`Dataset` of the rows and columns of ``source`` that the charts can use.
+
+    ``source`` is a path or the file's bytes. Only ``columns`` (default
+    :func:`stream_columns`) are kept, and only the rows of players with at
+    least ``min_minutes`` played over all their rows, one of which lists one
+    of ``positions`` (normalised names such as ``"CM"``; default any).
+    ``csv`` forces the CSV reader; by
+    default it is used for paths ending in ``.csv``.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        digest, open_source = content_hash(source), lambda: io.BytesIO(source)
+    else:
+        digest, open_source = _file_hash(source), lambda: source
+        if csv is None:
+            csv = os.fspath(source).lower().endswith(".csv")
+    keep = set(stream_columns() if columns is None else columns)
+    positions = set(positions) if positions else None
+    key = _stream_key(digest, min_minutes, positions, sorted(keep))
+
+    def load():
+        dataset = _read_disk(key)
+        if dataset is not None:
+            return dataset
+        start = time.perf_counter()
+        reader = (_csv_chunks(open_source(), chunk_rows, keep) if csv
+                  else _xlsx_chunks(open_source(), chunk_rows))
+        frames, splits = [], []
+        with stage("stream.read"):
+            for chunk in reader:
+                frame, split = _filter_chunk(chunk, keep)
+                frames.append(frame)
+                if split is not None:
+                    splits.append(split)
+        with stage("stream.concat"):
+            frame = compact_frame(pd.concat(frames, ignore_index=True)) if frames \
+                else pd.DataFrame(columns=sorted(keep))
+            if splits:
+                split = compact_frame(pd.concat(splits, ignore_index=True))
+            else:
+                split = pd.DataFrame(index=frame.index, columns=POSITION_COLUMNS)
+        with stage("stream.filter"):
+            wanted = _wanted_rows(frame, split, min_minutes, positions)
+            if not wanted.all():
+                frame = frame[wanted].reset_index(drop=True)
+                split = split[wanted].reset_index(drop=True)
+        dataset = Dataset(key, frame, split, parse_seconds=time.perf_counter() - start,
+                          source="stream")
+        _write_disk(dataset)
+        return dataset
+
+    return workbook_cache.get_or_create(key, load)[0]
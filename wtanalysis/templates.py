@@ -0,0 +1,95 @@
+"""Metric templates for each position, loaded from ``templates.json``.
+
+A template lists, per category (attacking, possession, defending), the
+Wyscout columns a position is charted on and the label each one gets on
+the charts. A position can also name another position to share its
+template (``"RB": "LB"``). ``WTA_TEMPLATES`` points at a replacement file,
+so adding or changing a template needs no code change.
+
+The registry is loaded and validated once per process; a dataset resolves
+the columns against its frame once (:attr:`Dataset.template_columns`).
+"""
+import json
+import os
+
+BUNDLED_TEMPLATES = os.path.join(os.path.dirname(__file__), "templates.json")
+
+# Chart categories, in slice order
+CATEGORIES = ("attacking", "possession", "defending")
+
+
+class TemplateError(ValueError):
+    """The templates file is malformed."""
+
+
+class Template:
+    """One position's metrics: ``columns``, ``labels`` and ``categories``, in slice order."""
+
+    def __init__(self, position, metrics):
+        self.position = position
+        self.columns = tuple(column for column, _, _ in metrics)
+        self.labels = tuple(label for _, label, _ in metrics)
+        self.categories = tuple(category for _, _, category in metrics)
+
+    def resolve(self, columns):
+        """``(indices, missing)``: positions of the metrics in ``columns`` and any not found."""
+        indices = columns.get_indexer(self.columns)
+        missing = [column for column, index in zip(self.columns, indices) if index < 0]
+        return indices, missing
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __repr__(self):
+        return f"Template({self.position!r}, {len(self)} metrics)"
+
+
+def _metrics(position, spec):
+    if not isinstance(spec, dict):
+        raise TemplateError(f"{position}: expected categories of metrics, got {spec!r}")
+    unknown = set(spec) - set(CATEGORIES)
+    if unknown:
+        raise TemplateError(f"{position}: unknown categories {sorted(unknown)}")
+    metrics = []
+    for category in CATEGORIES:
+        for entry in spec.get(category, []):
+            if not isinstance(entry, dict) or not entry.get("column"):
+                raise TemplateError(f"{position}: metric without a column: {entry!r}")
+            metrics.append((entry["column"], entry.get("label", entry["column"]), category))
+    if not metrics:
+        raise TemplateError(f"{position}: template has no metrics")
+    columns = [column for column, _, _ in metrics]
+    if len(set(columns)) != len(columns):
+        raise TemplateError(f"{position}: a column is listed twice")
+    return metrics
+
+
+def load_templates(path=None):
+    """``{position: Template}`` from ``path`` (default: ``WTA_TEMPLATES`` or the bundled file)."""
+    path = path or os.environ.get("WTA_TEMPLATES") or BUNDLED_TEMPLATES
+    with open(path, encoding="utf-8") as f:
+        specs = json.load(f)
+    templates = {}
+    for position, spec in specs.items():
+        if isinstance(spec, str):
+            continue
+        templates[position] = Template(position, _metrics(position, spec))
+    for position, spec in specs.items():
+        if isinstance(spec, str):
+            if spec not in templates:
+                raise TemplateError(f"{position}: shares the template of unknown position {spec!r}")
+            templates[position] = Template(position, list(zip(
+                templates[spec].columns, templates[spec].labels, templates[spec].categories)))
+    return templates
+
+
+def resolve_templates(columns, templates=None):
+    """``{position: (indices, missing)}`` for every template against ``columns``."""
+    templates = TEMPLATES if templates is None else templates
+    return {position: template.resolve(columns) for position, template in templates.items()}
+
+
+TEMPLATES = load_templates()
+
+# Metric columns per position, the shape the percentile cube takes
+POSITION_COLS = {position: list(template.columns) for position, template in TEMPLATES.items()}
@@ -0,0 +1,161 @@
+"""Per-stage timings of the pipeline, for the debug panel and monitoring.
+
+Hot paths are wrapped in :func:`stage`::
+
+    with stage("parse.read_excel"):
+        frame = pd.read_excel(...)
+
+Each finished stage is
+
+* added to the process-wide totals behind :func:`prometheus_text`;
+* appended to the current rerun's :class:`Timings`, if one is active
+  (:func:`start`, :func:`record`), which is what the app's debug sidebar shows;
+* logged as one JSON object on the ``wtanalysis.timing`` logger at DEBUG,
+  and appended as a JSON line to ``WTA_METRICS_LOG`` when that is set.
+
+Stages in background threads (logo downloads, the percentile cube) only
+count towards the totals and the logs.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .cache import cache_stats
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("wtanalysis_timings", default=None)
+_lock = threading.Lock()
+# stage -> [count, total seconds, max seconds]
+_totals = {}
+
+
+class Timings:
+    """The stages timed during one rerun (or any other unit of work), in order."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = []
+
+    def add(self, name, seconds):
+        self.stages.append((name, seconds))
+
+    def summary(self):
+        """``{stage: (calls, total seconds)}`` in first-seen order."""
+        out = {}
+        for name, seconds in self.stages:
+            calls, total = out.get(name, (0, 0.0))
+            out[name] = (calls + 1, total + seconds)
+        return out
+
+    def elapsed(self):
+        """Seconds since collection started (stages nest, so they don't add up to this)."""
+        return time.perf_counter() - self._start
+
+    def jsonl(self):
+        """The stages as JSON lines, one object per stage."""
+        return "".join(_entry(name, seconds, self.started) + "\n" for name, seconds in self.stages)
+
+
+@contextmanager
+def record():
+    """Collect the stages timed in this context into a fresh :class:`Timings`."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def start():
+    """Collect stages for the rest of this context (a rerun); returns the :class:`Timings`."""
+    timings = Timings()
+    _current.set(timings)
+    return timings
+
+
+def _entry(name, seconds, ts=None):
+    return json.dumps(dict(ts=time.time() if ts is None else ts, stage=name,
+                           seconds=round(seconds, 6)))
+
+
+def _write_log(entry):
+    path = os.environ.get("WTA_METRICS_LOG")
+    if not path:
+        return
+    try:
+        with _lock, open(path, "a", encoding="utf-8") as fh:
+            fh.write(entry + "\n")
+    except OSError as exc:
+        logger.warning("Could not write metrics log %s: %s", path, exc)
+
+
+def add(name, seconds):
+    """Record a stage that was timed elsewhere."""
+    with _lock:
+        totals = _totals.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+    if logger.isEnabledFor(logging.DEBUG) or os.environ.get("WTA_METRICS_LOG"):
+        entry = _entry(name, seconds)
+        logger.debug(entry)
+        _write_log(entry)
+
+
+@contextmanager
+def stage(name):
+    """Time the body as pipeline stage ``name`` (also when it raises)."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start_time)
+
+
+def stage_totals():
+    """``{stage: (count, total seconds, max seconds)}`` since the process started."""
+    with _lock:
+        return {name: tuple(values) for name, values in _totals.items()}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """Stage timings and cache counters in the Prometheus text exposition format."""
+    lines = [
+        "# HELP wtanalysis_stage_seconds Time spent in each pipeline stage.",
+        "# TYPE wtanalysis_stage_seconds summary",
+    ]
+    totals = stage_totals()
+    for name, (count, total, _) in sorted(totals.items()):
+        lines.append(f'wtanalysis_stage_seconds_count{{stage="{_label(name)}"}} {count}')
+        lines.append(f'wtanalysis_stage_seconds_sum{{stage="{_label(name)}"}} {total:.6f}')
+    lines += [
+        "# HELP wtanalysis_stage_seconds_max Slowest single run of each pipeline stage.",
+        "# TYPE wtanalysis_stage_seconds_max gauge",
+    ]
+    for name, (_, _, longest) in sorted(totals.items()):
+        lines.append(f'wtanalysis_stage_seconds_max{{stage="{_label(name)}"}} {longest:.6f}')
+    caches = cache_stats()
+    for metric, kind, field, help_text in (
+        ("wtanalysis_cache_hits_total", "counter", "hits", "Cache lookups that hit."),
+        ("wtanalysis_cache_misses_total", "counter", "misses", "Cache lookups that missed."),
+        ("wtanalysis_cache_entries", "gauge", "entries", "Entries held in each cache."),
+        ("wtanalysis_cache_bytes", "gauge", "bytes", "Bytes held by size-bounded caches."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, stats in caches.items():
+            lines.append(f'{metric}{{cache="{_label(name)}"}} {stats[field]}')
+    return "\n".join(lines) + "\n"